@@ -1,23 +1,93 @@
 import sys
-import scanner
-import parser
-import symbol
+import mmap
+from .scanner import Scanner
+from .parser import Parser
+from .semantic_analyzer import SemanticAnalyzer
+from .context import CompilationContext
+from .output import MemoryOutput, NullOutput, get_output_backend
+
+
+class CompilationResult(object):
+    """Output files of one compilation, read back from its output backend."""
+
+    def __init__(self, context, parser):
+        self._context = context
+        self._output = context.get_output_backend()
+        self._parser = parser
+
+    def get_context(self):
+        return self._context
+
+    def get_symbol_table(self):
+        return self._context.get_symbol_table()
+
+    def get_output_backend(self):
+        return self._output
+
+    def get_parser(self):
+        return self._parser
+
+    def get_tokens(self):
+        return self._output.get(Scanner._tokens_file)
+
+    def get_lexical_errors(self):
+        return self._output.get(Scanner._lexical_errors_file)
+
+    def get_parse_tree(self):
+        return self._output.get(Parser._parse_tree_file)
+
+    def get_syntax_errors(self):
+        return self._output.get(Parser._syntax_errors_file)
+
+    def get_output(self):
+        return self._output.get(SemanticAnalyzer._output_file)
+
+    def get_semantic_errors(self):
+        return self._output.get(SemanticAnalyzer._errors_file)
+
+
+def compile_program(content, **kwargs):
+    """
+    Compiles content in a new CompilationContext, or in CONTEXT, and returns
+    a CompilationResult. Output goes to a MemoryOutput unless OUTPUT gives
+    another backend, True writes to ./output and False discards everything.
+    """
+    context = kwargs.get('CONTEXT')
+    if context is None:
+        output = get_output_backend(
+            kwargs.get('OUTPUT', MemoryOutput())) or NullOutput()
+        context = CompilationContext(**dict(kwargs, OUTPUT=output))
+    kwargs.update(CONTEXT=context, OUTPUT=True)
+    _scanner = Scanner(content, **kwargs)
+    try:
+        _parser = Parser(_scanner, **kwargs)
+    finally:
+        _scanner.close()
+    return CompilationResult(context, _parser)
 
 
 def main(path):
     try:
         with open(path, 'rb') as content_file:
-            content = content_file.read()
+            try:
+                # Map the file instead of reading it, the scanner only slices it
+                content = mmap.mmap(content_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                content = b''
     except IOError:
         print("Error: File not found.")
         return 1
-    _scanner = scanner.Scanner(content)
-    _parser = parser.Parser(_scanner)
-    print(_symbol_table)
+    try:
+        result = compile_program(content, OUTPUT=True)
+    finally:
+        if isinstance(content, mmap.mmap):
+            content.close()
+    print(result.get_symbol_table())
     return 0
 
 
 if __name__ == '__main__':
-    # TODO: Read input file from arguments
-    status = main('./input.txt')
+    status = main(sys.argv[1] if len(sys.argv) > 1 else './input.txt')
     sys.exit(status)
@@ -0,0 +1,46 @@
+from .symbol import SymbolTable
+from .output import FLUSH_THRESHOLD, NullSink, get_output_backend
+
+
+class CompilationContext(object):
+    """
+    State of one compilation shared by the scanner, parser and semantic
+    analyzer: the symbol table with its address and temporary counters,
+    and the output backend with every sink opened on it.
+    """
+
+    def __init__(self, **kwargs):
+        self.OUTPUT = kwargs.get('OUTPUT', True)
+        self.FLUSH_THRESHOLD = kwargs.get('FLUSH_THRESHOLD', FLUSH_THRESHOLD)
+        self._output = get_output_backend(self.OUTPUT)
+        self._symbol_table = SymbolTable(
+            kwargs.get('BASE_ADDRESS', 500), kwargs.get('TEMP_ADDRESS', 1000))
+        self._sinks = []
+
+    def __repr__(self):
+        return "CompilationContext(%r)" % self._output
+
+    def get_symbol_table(self):
+        return self._symbol_table
+
+    def get_output_backend(self):
+        return self._output
+
+    def open(self, name, output=True):
+        """Opens name on the context's backend, or on output if it is a backend."""
+        backend = self._output if output is True else get_output_backend(output)
+        if backend is None:
+            sink = NullSink(name)
+        else:
+            sink = backend.open(name, self.FLUSH_THRESHOLD)
+        self._sinks.append(sink)
+        return sink
+
+    def close_output(self):
+        for sink in self._sinks:
+            sink.close()
+
+    def clear(self):
+        self.close_output()
+        self._sinks = []
+        self._symbol_table.clear()
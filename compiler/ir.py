@@ -0,0 +1,113 @@
+import sys
+
+# Operand kinds
+DIRECT = 0
+IMMEDIATE = 1
+INDIRECT = 2
+LABEL = 3
+
+_PREFIXES = {DIRECT: '', IMMEDIATE: '#', INDIRECT: '@', LABEL: ''}
+
+# Argument position holding the jump target of each jump operation
+LABEL_ARGUMENTS = {'JP': 0, 'JPF': 1}
+
+OPERAND_COUNT = 3
+
+
+class Operand(object):
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value
+
+    def __str__(self):
+        return "%s%d" % (_PREFIXES[self.kind], self.value)
+
+    def __repr__(self):
+        return "Operand(%d, %d)" % (self.kind, self.value)
+
+    def __eq__(self, other):
+        return isinstance(other, Operand) and self.kind == other.kind and self.value == other.value
+
+    def __hash__(self):
+        return hash((self.kind, self.value))
+
+    def get_kind(self):
+        return self.kind
+
+    def get_value(self):
+        return self.value
+
+    def is_direct(self):
+        return self.kind == DIRECT
+
+    def is_immediate(self):
+        return self.kind == IMMEDIATE
+
+    def is_indirect(self):
+        return self.kind == INDIRECT
+
+    def is_label(self):
+        return self.kind == LABEL
+
+
+def make_operand(value, label=False):
+    """Builds an Operand from an address, a line number, '#n' or '@n'."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, Operand):
+        return value
+    if isinstance(value, str):
+        if value[0] == '#':
+            return Operand(IMMEDIATE, int(value[1:]))
+        if value[0] == '@':
+            return Operand(INDIRECT, int(value[1:]))
+    return Operand(LABEL if label else DIRECT, int(value))
+
+
+class Instruction(object):
+    __slots__ = ('line', 'operation', 'operands')
+
+    def __init__(self, line, operation, arguments=()):
+        self.line = line
+        self.operation = operation
+        label = LABEL_ARGUMENTS.get(operation)
+        operands = [make_operand(argument, index == label)
+                    for index, argument in enumerate(arguments)]
+        if len(operands) > OPERAND_COUNT:
+            print("Too many operands for %s" % operation)
+            sys.exit(1)
+        operands.extend([None] * (OPERAND_COUNT - len(operands)))
+        self.operands = operands
+
+    def __str__(self):
+        return "%d\t(%s, %s, %s, %s)" % ((self.line, self.operation) + tuple(
+            '' if operand is None else str(operand) for operand in self.operands))
+
+    __repr__ = __str__
+
+    def get_line(self):
+        return self.line
+
+    def get_operation(self):
+        return self.operation
+
+    def get_operands(self):
+        return self.operands
+
+
+def format_program(instructions):
+    return ''.join(["%s\n" % instruction for instruction in instructions])
+
+
+def parse_program(text):
+    """Parses the output.txt format back into Instructions."""
+    instructions = []
+    for row in text.splitlines():
+        if not row.strip():
+            continue
+        line, code = row.split('\t', 1)
+        fields = code.strip()[1:-1].split(', ')
+        instructions.append(Instruction(int(line), fields[0], fields[1:]))
+    return instructions
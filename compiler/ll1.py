@@ -0,0 +1,316 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import subprocess
+from .grammar import GrammarString, ActionSymbol
+from .token import TokenType
+
+GRAMMAR_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'c-minus-grammar.txt')
+# Tables computed from GRAMMAR_FILE, regenerated when the grammar changes
+TABLE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'parse_table.json')
+# Bump when the layout of TABLE_FILE changes
+TABLE_VERSION = 1
+# Seconds a fresh interpreter may take to compile a small program with the
+# ll1 engine, checked by python -m compiler.ll1 --benchmark
+COLD_START_BUDGET = 1.0
+COLD_START_PROGRAM = (
+    "from compiler.compiler import compile_program\n"
+    "compile_program(b'void main(void){\\nint a;\\na = 1;\\n}\\n', PARSER='ll1', OUTPUT=False)\n")
+
+EPSILON = 'ε'
+END = TokenType.EOF.value
+
+# Kinds of the symbols pushed on the parse stack
+TERMINAL = 0
+NONTERMINAL = 1
+ACTION = 2
+
+
+class GrammarError(Exception):
+    pass
+
+
+def read_grammar(text):
+    """
+    Returns the productions of text as (head, body) pairs. A body is a list
+    of symbols, '#NAME' is an ActionSymbol and '#NAME/terminal' an action
+    that only runs when the production was chosen on that terminal.
+    """
+    productions = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        head, arrow, body = line.partition('->')
+        head = head.strip()
+        if not arrow or not head:
+            raise GrammarError("Invalid production on line %d" % number)
+        body = [symbol for symbol in body.split() if symbol != EPSILON]
+        productions.append((head, body))
+    return productions
+
+
+def terminal_of(token):
+    """Key of token in the parse table: its kind for ID and NUM, otherwise its lexeme."""
+    token_type = token.get_type()
+    if token_type == TokenType.ID or token_type == TokenType.NUM:
+        return token_type.value
+    if token_type == TokenType.EOF:
+        return END
+    return token.get_lexeme()
+
+
+class ParseTable(object):
+    """
+    LL(1) parse table of a grammar. get_entry(nonterminal, terminal) is the
+    body to push for the lookahead terminal as a tuple of (kind, symbol)
+    pairs in reverse order, or None when the lookahead is a syntax error.
+    The sets and the table are computed from text unless data, as returned
+    by get_data(), is given.
+    """
+
+    def __init__(self, text, data=None):
+        self._productions = read_grammar(text)
+        if not self._productions:
+            raise GrammarError("Empty grammar")
+        self._start = self._productions[0][0]
+        self._nonterminals = set(head for head, _body in self._productions)
+        self._first = {}
+        self._follow = {}
+        self._table = {}
+        if data is None:
+            self._compute_first()
+            self._compute_follow()
+            self._compute_table()
+        else:
+            self._load(data)
+        self._sizes = dict((nonterminal, dict(
+            (terminal, self._size(body)) for terminal, body in row.items()))
+            for nonterminal, row in self._table.items())
+
+    def __repr__(self):
+        return "ParseTable(%d productions)" % len(self._productions)
+
+    def _symbols(self, body):
+        """Grammar symbols of body without the action symbols."""
+        return [symbol for symbol in body if not symbol.startswith('#')]
+
+    def _first_of(self, symbols):
+        """FIRST set of a sequence of symbols, EPSILON if all of them can be empty."""
+        first = set()
+        for symbol in symbols:
+            if symbol not in self._nonterminals:
+                first.add(symbol)
+                return first
+            first |= self._first[symbol] - {EPSILON}
+            if EPSILON not in self._first[symbol]:
+                return first
+        first.add(EPSILON)
+        return first
+
+    def _compute_first(self):
+        for nonterminal in self._nonterminals:
+            self._first[nonterminal] = set()
+        changed = True
+        while changed:
+            changed = False
+            for head, body in self._productions:
+                first = self._first_of(self._symbols(body))
+                if not first <= self._first[head]:
+                    self._first[head] |= first
+                    changed = True
+
+    def _compute_follow(self):
+        for nonterminal in self._nonterminals:
+            self._follow[nonterminal] = set()
+        self._follow[self._start].add(END)
+        changed = True
+        while changed:
+            changed = False
+            for head, body in self._productions:
+                symbols = self._symbols(body)
+                for index, symbol in enumerate(symbols):
+                    if symbol not in self._nonterminals:
+                        continue
+                    follow = self._first_of(symbols[index + 1:])
+                    if EPSILON in follow:
+                        follow = (follow - {EPSILON}) | self._follow[head]
+                    if not follow <= self._follow[symbol]:
+                        self._follow[symbol] |= follow
+                        changed = True
+
+    def _entry(self, body, terminal):
+        """Stack entries of body chosen on terminal, guarded actions resolved."""
+        entries = []
+        for symbol in body:
+            if symbol.startswith('#'):
+                name, _slash, guard = symbol[1:].partition('/')
+                if guard and guard != terminal:
+                    continue
+                entries.append((ACTION, ActionSymbol[name]))
+            elif symbol in self._nonterminals:
+                entries.append((NONTERMINAL, GrammarString(symbol)))
+            else:
+                entries.append((TERMINAL, symbol))
+        return tuple(reversed(entries))
+
+    def _compute_table(self):
+        for nonterminal in self._nonterminals:
+            self._table[nonterminal] = {}
+        for head, body in self._productions:
+            first = self._first_of(self._symbols(body))
+            terminals = first - {EPSILON}
+            if EPSILON in first:
+                terminals |= self._follow[head]
+            row = self._table[head]
+            for terminal in terminals:
+                if terminal in row:
+                    raise GrammarError("LL(1) conflict for %s on %s" % (head, terminal))
+                row[terminal] = self._entry(body, terminal)
+        # Rows are looked up by GrammarString while parsing
+        self._table = dict((GrammarString(head), row) for head, row in self._table.items())
+
+    def _load(self, data):
+        self._first = dict((head, set(first)) for head, first in data['first'].items())
+        self._follow = dict((head, set(follow)) for head, follow in data['follow'].items())
+        for head, row in data['table'].items():
+            self._table[GrammarString(head)] = dict(
+                (terminal, tuple((kind, ActionSymbol[symbol] if kind == ACTION else
+                                  GrammarString(symbol) if kind == NONTERMINAL else symbol)
+                                 for kind, symbol in entry))
+                for terminal, entry in row.items())
+
+    def get_data(self):
+        """The sets and the table as plain lists and dicts for json."""
+        return {
+            'first': dict((head, sorted(first)) for head, first in self._first.items()),
+            'follow': dict((head, sorted(follow)) for head, follow in self._follow.items()),
+            'table': dict((head.value, dict(
+                (terminal, [[kind, symbol if kind == TERMINAL else symbol.name if kind == ACTION
+                             else symbol.value] for kind, symbol in entry])
+                for terminal, entry in row.items()))
+                for head, row in self._table.items())
+        }
+
+    def get_start(self):
+        return GrammarString(self._start)
+
+    def get_entry(self, nonterminal, terminal):
+        return self._table[nonterminal].get(terminal)
+
+    def _size(self, body):
+        """Number of parse tree children of a body, its epsilon if it is empty."""
+        if not body:
+            return 1
+        return sum(1 for kind, _symbol in body if kind != ACTION)
+
+    def get_size(self, nonterminal, terminal):
+        """Children of nonterminal chosen on terminal, None on a syntax error."""
+        return self._sizes[nonterminal].get(terminal)
+
+    def get_rows(self):
+        return self._table
+
+    # For testing purposes
+    def get_first(self, nonterminal):
+        return self._first[nonterminal]
+
+    def get_follow(self, nonterminal):
+        return self._follow[nonterminal]
+
+
+def get_grammar_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def write_parse_table(table, text, path=TABLE_FILE):
+    """Writes the tables of text to path with the version and the grammar's hash."""
+    data = {'version': TABLE_VERSION, 'grammar': get_grammar_hash(text)}
+    data.update(table.get_data())
+    with open(path, 'w', encoding='utf-8') as table_file:
+        json.dump(data, table_file, sort_keys=True, separators=(',', ':'))
+
+
+def load_parse_table(grammar_path=GRAMMAR_FILE, path=TABLE_FILE):
+    """
+    Returns the ParseTable of the grammar at grammar_path, read from path
+    when it was written for the same grammar and TABLE_VERSION. Otherwise
+    the table is computed and path is rewritten if it is writable.
+    """
+    with open(grammar_path, encoding='utf-8') as grammar_file:
+        text = grammar_file.read()
+    try:
+        with open(path, encoding='utf-8') as table_file:
+            data = json.load(table_file)
+        if data.get('version') == TABLE_VERSION and data.get('grammar') == get_grammar_hash(text):
+            return ParseTable(text, data)
+    except (IOError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    table = ParseTable(text)
+    try:
+        write_parse_table(table, text, path)
+    except IOError:
+        pass
+    return table
+
+
+_parse_table = None
+
+
+def get_parse_table():
+    """The parse table of c-minus-grammar.txt, loaded once per process."""
+    global _parse_table
+    if _parse_table is None:
+        _parse_table = load_parse_table()
+    return _parse_table
+
+
+def benchmark_cold_start(repeat=3):
+    """
+    Returns the seconds of the fastest of repeat runs of COLD_START_PROGRAM
+    in a fresh interpreter, which loads the parse table from TABLE_FILE.
+    """
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', COLD_START_PROGRAM], cwd=root)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(path):
+    """Regenerates TABLE_FILE from the grammar at path."""
+    try:
+        with open(path, encoding='utf-8') as grammar_file:
+            text = grammar_file.read()
+    except IOError:
+        print("Error: File not found.")
+        return 1
+    try:
+        table = ParseTable(text)
+    except GrammarError as error:
+        print("Error: %s" % error)
+        return 1
+    write_parse_table(table, text)
+    print(table)
+    return 0
+
+
+def main_benchmark():
+    """Times a cold start against COLD_START_BUDGET."""
+    elapsed = benchmark_cold_start()
+    print("Cold start: %.3f s, budget %.3f s" % (elapsed, COLD_START_BUDGET))
+    return 0 if elapsed <= COLD_START_BUDGET else 1
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--benchmark']:
+        status = main_benchmark()
+    else:
+        status = main(sys.argv[1] if len(sys.argv) > 1 else GRAMMAR_FILE)
+    sys.exit(status)
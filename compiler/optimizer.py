@@ -0,0 +1,475 @@
+from .ir import Instruction, Operand, DIRECT, IMMEDIATE, INDIRECT, LABEL, LABEL_ARGUMENTS
+from .symbol import INT_SIZE
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+# Position of the operand each operation writes to
+TARGETS = {'ASSIGN': 1, 'ADD': 2, 'SUB': 2, 'MULT': 2, 'LT': 2, 'EQ': 2}
+
+FOLDS = {
+    'ADD': lambda a, b: a + b,
+    'SUB': lambda a, b: a - b,
+    'MULT': lambda a, b: a * b,
+    'LT': lambda a, b: 1 if a < b else 0,
+    'EQ': lambda a, b: 1 if a == b else 0
+}
+
+
+def get_target(instruction):
+    position = TARGETS.get(instruction.operation)
+    return None if position is None else instruction.operands[position]
+
+
+def get_sources(instruction):
+    """Operands read by instruction, the address of an indirect target included."""
+    position = TARGETS.get(instruction.operation)
+    sources = []
+    for index, operand in enumerate(instruction.operands):
+        if operand is None or operand.kind == LABEL:
+            continue
+        if index != position or operand.kind == INDIRECT:
+            sources.append(operand)
+    return sources
+
+
+def get_jump_targets(instructions):
+    targets = set()
+    for instruction in instructions:
+        position = LABEL_ARGUMENTS.get(instruction.operation)
+        if position is not None:
+            targets.add(instruction.operands[position].value)
+    return targets
+
+
+def get_line_indexes(instructions):
+    """
+    Index of the first instruction at or after every line of instructions,
+    len(instructions) for the line past the last one.
+    """
+    end = max([instruction.line for instruction in instructions] + [-1]) + 1
+    lines = [len(instructions)] * (end + 1)
+    index = len(instructions) - 1
+    for line in range(end - 1, -1, -1):
+        lines[line] = lines[line + 1]
+        if index >= 0 and instructions[index].line == line:
+            lines[line] = index
+            index -= 1
+    return lines
+
+
+def get_jump_index(instruction, lines):
+    """Index of the instruction a JP or JPF continues at, jumps past the end halt."""
+    target = instruction.operands[LABEL_ARGUMENTS[instruction.operation]].value
+    return lines[min(target, len(lines) - 1)]
+
+
+def renumber(instructions):
+    """
+    Numbers instructions from 0 in their order. A jump to a line that is
+    gone continues at the first remaining line after it.
+    """
+    lines = get_line_indexes(instructions)
+    program = []
+    for index, instruction in enumerate(instructions):
+        operands = list(instruction.operands)
+        position = LABEL_ARGUMENTS.get(instruction.operation)
+        if position is not None:
+            operands[position] = Operand(LABEL, get_jump_index(instruction, lines))
+        program.append(Instruction(index, instruction.operation, operands))
+    return program
+
+
+def get_basic_blocks(instructions):
+    """
+    Splits instructions into basic blocks. Returns the (start, end) index
+    range of every block and the indexes of the blocks that can follow it.
+    """
+    lines = get_line_indexes(instructions)
+    count = len(instructions)
+    leaders = [False] * (count + 1)
+    leaders[0] = True
+    for index, instruction in enumerate(instructions):
+        if instruction.operation in LABEL_ARGUMENTS:
+            leaders[get_jump_index(instruction, lines)] = True
+            leaders[index + 1] = True
+    blocks = []
+    block_of = [None] * (count + 1)
+    for index in range(count):
+        if leaders[index]:
+            blocks.append([index, index])
+        blocks[-1][1] = index + 1
+        block_of[index] = len(blocks) - 1
+    successors = []
+    for block, (start, end) in enumerate(blocks):
+        last = instructions[end - 1]
+        following = []
+        if last.operation != 'JP' and end < count:
+            following.append(block + 1)
+        if last.operation in LABEL_ARGUMENTS:
+            target = block_of[get_jump_index(last, lines)]
+            if target is not None and target not in following:
+                following.append(target)
+        successors.append(following)
+    return [tuple(block) for block in blocks], successors
+
+
+def _count(stats, rule, count=1):
+    if stats is not None:
+        stats[rule] = stats.get(rule, 0) + count
+
+
+def _substitute(operand, known):
+    if operand is None or operand.value not in known:
+        return operand
+    if operand.kind == DIRECT:
+        return Operand(IMMEDIATE, known[operand.value])
+    if operand.kind == INDIRECT and known[operand.value] >= 0 and known[operand.value] % INT_SIZE == 0:
+        return Operand(DIRECT, known[operand.value])
+    return operand
+
+
+def fold_constants(instructions, symbol_table, stats=None):
+    """
+    Folds operations on immediates and propagates the values of temporaries
+    that are written once. A value is only propagated inside its basic
+    block, and the temporaries no longer read are dropped.
+    """
+    writes = {}
+    for instruction in instructions:
+        target = get_target(instruction)
+        if target is not None and target.kind == DIRECT:
+            writes[target.value] = writes.get(target.value, 0) + 1
+    jump_targets = get_jump_targets(instructions)
+    known = {}
+    constants = {}
+    program = []
+    for instruction in instructions:
+        if instruction.line in jump_targets:
+            known = {}
+        operation = instruction.operation
+        position = TARGETS.get(operation)
+        operands = [operand if operand is None or operand.kind == LABEL or
+                    index == position and operand.kind == DIRECT else _substitute(operand, known)
+                    for index, operand in enumerate(instruction.operands)]
+        if operation in FOLDS and operands[0].kind == IMMEDIATE and operands[1].kind == IMMEDIATE:
+            value = FOLDS[operation](operands[0].value, operands[1].value)
+            # An overflow is left for the program to report
+            if INT_MIN <= value <= INT_MAX:
+                operation = 'ASSIGN'
+                operands = [Operand(IMMEDIATE, value), operands[2], None]
+        folded = Instruction(instruction.line, operation, operands)
+        target = get_target(folded)
+        if target is not None and target.kind == DIRECT:
+            known.pop(target.value, None)
+            if operation == 'ASSIGN' and operands[0].kind == IMMEDIATE and writes[target.value] == 1 \
+                    and symbol_table.is_temporary(target.value):
+                known[target.value] = operands[0].value
+                constants[target.value] = folded
+        elif target is not None:
+            # An indirect write may change any cell
+            known = {}
+        if operation in LABEL_ARGUMENTS:
+            known = {}
+        program.append(folded)
+    reads = set()
+    for instruction in program:
+        reads.update(operand.value for operand in get_sources(instruction)
+                     if operand.kind != IMMEDIATE)
+    dropped = set(id(constants[address]) for address in constants if address not in reads)
+    _count(stats, 'fold_constants', len(dropped))
+    if not dropped:
+        return program
+    return renumber([instruction for instruction in program if id(instruction) not in dropped])
+
+
+# Operations without side effects besides their target
+_PURE = ('ASSIGN', 'LT', 'EQ')
+
+
+def eliminate_dead_code(instructions, symbol_table, stats=None):
+    """
+    Replaces JPFs on immediates by a JP or nothing, drops the blocks that
+    can not be reached from line 0 and the writes to temporaries that are
+    never read. ADD, SUB and MULT are kept, they may still overflow.
+    """
+    program = []
+    for instruction in instructions:
+        condition = instruction.operands[0]
+        if instruction.operation == 'JPF' and condition.kind == IMMEDIATE:
+            if condition.value:
+                _count(stats, 'constant_jumps')
+                continue
+            instruction = Instruction(instruction.line, 'JP', [instruction.operands[1]])
+        program.append(instruction)
+    if not program:
+        return program
+    blocks, successors = get_basic_blocks(program)
+    reachable = [False] * len(blocks)
+    reachable[0] = True
+    pending = [0]
+    while pending:
+        for block in successors[pending.pop()]:
+            if not reachable[block]:
+                reachable[block] = True
+                pending.append(block)
+    count = len(program)
+    program = [instruction for block, (start, end) in enumerate(blocks) if reachable[block]
+               for instruction in program[start:end]]
+    _count(stats, 'unreachable_blocks', count - len(program))
+    reads = {}
+    writers = {}
+    for index, instruction in enumerate(program):
+        for operand in get_sources(instruction):
+            if operand.kind != IMMEDIATE:
+                reads[operand.value] = reads.get(operand.value, 0) + 1
+        target = get_target(instruction)
+        if target is not None and target.kind == DIRECT and symbol_table.is_temporary(target.value):
+            writers.setdefault(target.value, []).append(index)
+    dead = [False] * len(program)
+    pending = [address for address in writers if not reads.get(address)]
+    while pending:
+        for index in writers[pending.pop()]:
+            instruction = program[index]
+            if dead[index] or instruction.operation not in _PURE:
+                continue
+            dead[index] = True
+            for operand in get_sources(instruction):
+                if operand.kind == IMMEDIATE:
+                    continue
+                reads[operand.value] -= 1
+                if not reads[operand.value] and operand.value in writers:
+                    pending.append(operand.value)
+    _count(stats, 'dead_temporaries', sum(dead))
+    return renumber([instruction for index, instruction in enumerate(program) if not dead[index]])
+
+
+# Rounds of peephole() at most, every round is linear
+PEEPHOLE_ROUNDS = 16
+
+
+def _thread(index, program, lines, threaded):
+    """Index of the first instruction after following the JP chain from index."""
+    if index in threaded:
+        return threaded[index]
+    chain = []
+    while index < len(program) and program[index].operation == 'JP' and index not in threaded:
+        if index in chain:
+            # A loop of jumps never leaves, every jump in it stays as it is
+            break
+        chain.append(index)
+        index = get_jump_index(program[index], lines)
+    final = threaded.get(index, index)
+    for jump in chain:
+        threaded[jump] = final
+    return final
+
+
+def _simplify(instruction):
+    """ADD and SUB of #0 and MULT by #1 become an ASSIGN."""
+    operation = instruction.operation
+    a, b, target = instruction.operands
+    identity = {'ADD': 0, 'SUB': 0, 'MULT': 1}.get(operation)
+    if identity is None:
+        return instruction
+    if b.kind == IMMEDIATE and b.value == identity:
+        return Instruction(instruction.line, 'ASSIGN', [a, target])
+    if a.kind == IMMEDIATE and a.value == identity and operation != 'SUB':
+        return Instruction(instruction.line, 'ASSIGN', [b, target])
+    return instruction
+
+
+def _peephole_round(program, symbol_table, stats):
+    lines = get_line_indexes(program)
+    end_line = len(lines) - 1
+    jump_targets = set(get_jump_index(instruction, lines) for instruction in program
+                       if instruction.operation in LABEL_ARGUMENTS)
+    reads = {}
+    for instruction in program:
+        for operand in get_sources(instruction):
+            if operand.kind != IMMEDIATE:
+                reads[operand.value] = reads.get(operand.value, 0) + 1
+    threaded = {}
+    kept = []
+    changed = False
+    unreachable = False
+    index = 0
+    while index < len(program):
+        instruction = program[index]
+        operation = instruction.operation
+        if index in jump_targets:
+            unreachable = False
+        if unreachable:
+            _count(stats, 'unreachable')
+            changed = True
+            index += 1
+            continue
+        if operation in LABEL_ARGUMENTS:
+            position = LABEL_ARGUMENTS[operation]
+            target = get_jump_index(instruction, lines)
+            final = _thread(target, program, lines, threaded)
+            if final != target:
+                _count(stats, 'jump_threading')
+                changed = True
+                operands = list(instruction.operands)
+                line = program[final].line if final < len(program) else end_line
+                operands[position] = Operand(LABEL, line)
+                instruction = Instruction(instruction.line, operation, operands)
+                target = final
+            if target == index + 1 and (operation == 'JP' or instruction.operands[0].kind != INDIRECT):
+                _count(stats, 'jump_to_next')
+                changed = True
+                index += 1
+                continue
+            unreachable = operation == 'JP'
+        elif operation in FOLDS:
+            simplified = _simplify(instruction)
+            if simplified is not instruction:
+                _count(stats, 'identity')
+                changed = True
+                instruction = simplified
+                operation = instruction.operation
+        if operation == 'ASSIGN' and instruction.operands[0] == instruction.operands[1] \
+                and instruction.operands[0].kind == DIRECT:
+            _count(stats, 'self_assign')
+            changed = True
+            index += 1
+            continue
+        target = get_target(instruction)
+        following = program[index + 1] if index + 1 < len(program) else None
+        if target is not None and target.kind == DIRECT and following is not None \
+                and following.operation == 'ASSIGN' and following.operands[0] == target \
+                and reads.get(target.value) == 1 and index + 1 not in jump_targets \
+                and symbol_table.is_temporary(target.value):
+            # The temporary only carries the result to the ASSIGN
+            operands = list(instruction.operands)
+            operands[TARGETS[operation]] = following.operands[1]
+            instruction = Instruction(instruction.line, operation, operands)
+            _count(stats, 'fuse_assign')
+            changed = True
+            index += 1
+        kept.append(instruction)
+        index += 1
+    if not changed:
+        return program, False
+    return renumber(kept), True
+
+
+def peephole(instructions, symbol_table, stats=None):
+    """
+    Threads JP chains, drops jumps to the next line, instructions after a
+    JP that nothing jumps to and ASSIGN x, x, turns ADD #0 and MULT #1 into
+    an ASSIGN and writes results straight to the variable of the ASSIGN
+    that follows them. Rounds are repeated until nothing changes, or
+    PEEPHOLE_ROUNDS times. stats counts how often every rule applied.
+    """
+    program = list(instructions)
+    for _round in range(PEEPHOLE_ROUNDS):
+        program, changed = _peephole_round(program, symbol_table, stats)
+        if not changed:
+            break
+    return program
+
+
+def _temporaries(operands, symbol_table):
+    return [operand.value for operand in operands
+            if operand.kind != IMMEDIATE and symbol_table.is_temporary(operand.value)]
+
+
+def _get_liveness(program, blocks, successors, symbol_table):
+    """Temporaries live at the end of every block."""
+    uses = []
+    writes = []
+    for start, end in blocks:
+        used = set()
+        written = set()
+        for instruction in program[start:end]:
+            used.update(address for address in _temporaries(get_sources(instruction), symbol_table)
+                        if address not in written)
+            target = get_target(instruction)
+            if target is not None and target.kind == DIRECT and symbol_table.is_temporary(target.value):
+                written.add(target.value)
+        uses.append(used)
+        writes.append(written)
+    predecessors = [[] for _ in blocks]
+    for block, following in enumerate(successors):
+        for successor in following:
+            predecessors[successor].append(block)
+    live_in = [set() for _ in blocks]
+    live_out = [set() for _ in blocks]
+    pending = list(range(len(blocks)))
+    queued = [True] * len(blocks)
+    while pending:
+        block = pending.pop()
+        queued[block] = False
+        live_out[block] = set().union(*[live_in[successor] for successor in successors[block]])
+        live = uses[block] | (live_out[block] - writes[block])
+        if live != live_in[block]:
+            live_in[block] = live
+            for predecessor in predecessors[block]:
+                if not queued[predecessor]:
+                    queued[predecessor] = True
+                    pending.append(predecessor)
+    return live_out
+
+
+def allocate_temporaries(instructions, symbol_table, stats=None):
+    """
+    Gives temporaries that are never live at the same time the same
+    address, like a register allocator. Liveness is computed over the
+    basic blocks and the interference graph is colored greedily in the
+    order the temporaries first appear, and slot k is stored at the k-th
+    temporary address handed out by the symbol table.
+    """
+    program = list(instructions)
+    if not program:
+        return program
+    blocks, successors = get_basic_blocks(program)
+    live_out = _get_liveness(program, blocks, successors, symbol_table)
+    interference = {}
+    for instruction in program:
+        for address in _temporaries([operand for operand in instruction.operands
+                                     if operand is not None and operand.kind != LABEL], symbol_table):
+            interference.setdefault(address, set())
+    for block, (start, end) in enumerate(blocks):
+        live = set(live_out[block])
+        for instruction in reversed(program[start:end]):
+            target = get_target(instruction)
+            if target is not None and target.kind == DIRECT and target.value in interference:
+                live.discard(target.value)
+                interference[target.value].update(live)
+                for address in live:
+                    interference[address].add(target.value)
+            live.update(_temporaries(get_sources(instruction), symbol_table))
+    slots = {}
+    for address, neighbours in interference.items():
+        taken = set(slots[neighbour] for neighbour in neighbours if neighbour in slots)
+        slot = 0
+        while slot in taken:
+            slot += 1
+        slots[address] = slot
+    _count(stats, 'temporaries_before', len(slots))
+    _count(stats, 'temporaries_after', max(slots.values()) + 1 if slots else 0)
+    temporaries = symbol_table.get_temporaries()
+    allocated = []
+    for instruction in program:
+        operands = [Operand(operand.kind, temporaries[slots[operand.value]])
+                    if operand is not None and operand.kind in (DIRECT, INDIRECT) and operand.value in slots
+                    else operand for operand in instruction.operands]
+        allocated.append(Instruction(instruction.line, instruction.operation, operands))
+    return allocated
+
+
+PASSES = (fold_constants, eliminate_dead_code, peephole, allocate_temporaries)
+
+
+def optimize(instructions, symbol_table, passes=PASSES, stats=None):
+    """
+    Runs passes over the instructions and returns the optimized program,
+    stats counts how often every rule applied and the temporaries used
+    before and after allocate_temporaries.
+    """
+    program = list(instructions)
+    for optimization in passes:
+        program = optimization(program, symbol_table, stats)
+    return program
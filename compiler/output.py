@@ -0,0 +1,193 @@
+import sys
+import os
+from io import StringIO
+
+FLUSH_THRESHOLD = 64 * 1024
+
+
+class OutputSink(object):
+    """
+    Buffered writer for one output file of a compilation.
+    The file is opened (and cleared) once, appended text is kept in memory
+    until flush_threshold characters are pending, and overwrite() replaces
+    the whole contents without touching the disk until the next flush.
+    """
+
+    def __init__(self, path, flush_threshold=FLUSH_THRESHOLD):
+        self._path = path
+        self._flush_threshold = flush_threshold
+        self._buffer = []
+        self._pending = 0
+        self._truncate = False
+        self._file = None
+        try:
+            self._file = self._open('w')
+        except IOError:
+            print("Could not open %s" % path)
+            sys.exit(1)
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, self._path)
+
+    def _open(self, mode):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return open(self._path, mode)
+
+    def _close(self):
+        self._file.close()
+
+    def get_path(self):
+        return self._path
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._pending += len(text)
+        if self._pending >= self._flush_threshold:
+            self.flush()
+
+    def overwrite(self, text):
+        self._buffer = [text]
+        self._pending = len(text)
+        self._truncate = True
+
+    def flush(self):
+        if self._file is None and not self._buffer and not self._truncate:
+            return
+        try:
+            if self._file is None:
+                # Reopened after close()
+                self._file = self._open('a')
+            if self._truncate:
+                self._file.seek(0)
+                self._file.truncate()
+                self._truncate = False
+            if self._buffer:
+                self._file.write(''.join(self._buffer))
+            self._file.flush()
+        except IOError:
+            print("Could not write %s" % self._path)
+            sys.exit(1)
+        self._buffer = []
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        if self._file is None:
+            return
+        self._close()
+        self._file = None
+
+
+class MemorySink(OutputSink):
+    """OutputSink keeping the file contents in an io.StringIO."""
+
+    def __init__(self, path, flush_threshold=FLUSH_THRESHOLD):
+        self._stream = StringIO()
+        super().__init__(path, flush_threshold)
+
+    def _open(self, mode):
+        if mode == 'w':
+            self._stream.seek(0)
+            self._stream.truncate()
+        else:
+            self._stream.seek(0, 2)
+        return self._stream
+
+    def _close(self):
+        # Keep the stream, getvalue() is still needed after the compile
+        pass
+
+    def getvalue(self):
+        self.flush()
+        return self._stream.getvalue()
+
+
+class NullSink(object):
+    """Sink discarding everything written to it."""
+
+    def __init__(self, path, flush_threshold=FLUSH_THRESHOLD):
+        self._path = path
+
+    def __repr__(self):
+        return "NullSink(%s)" % self._path
+
+    def get_path(self):
+        return self._path
+
+    def write(self, text):
+        pass
+
+    def overwrite(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class DiskOutput(object):
+    """Writes the output files of a compilation into directory."""
+
+    def __init__(self, directory='./output'):
+        self._directory = directory
+
+    def __repr__(self):
+        return "DiskOutput(%s)" % self._directory
+
+    def get_directory(self):
+        return self._directory
+
+    def open(self, name, flush_threshold=FLUSH_THRESHOLD):
+        return OutputSink(os.path.join(self._directory, name), flush_threshold)
+
+    def get(self, name):
+        try:
+            with open(os.path.join(self._directory, name), 'r') as output_file:
+                return output_file.read()
+        except FileNotFoundError:
+            return ''
+
+
+class MemoryOutput(object):
+    """Keeps the output files of a compilation in memory."""
+
+    def __init__(self):
+        self._sinks = {}
+
+    def __repr__(self):
+        return "MemoryOutput(%s)" % ', '.join(self._sinks)
+
+    def open(self, name, flush_threshold=FLUSH_THRESHOLD):
+        sink = MemorySink(name, flush_threshold)
+        self._sinks[name] = sink
+        return sink
+
+    def get(self, name):
+        sink = self._sinks.get(name)
+        return sink.getvalue() if sink is not None else ''
+
+
+class NullOutput(object):
+    """Discards the output files of a compilation."""
+
+    def __repr__(self):
+        return "NullOutput()"
+
+    def open(self, name, flush_threshold=FLUSH_THRESHOLD):
+        return NullSink(name, flush_threshold)
+
+    def get(self, name):
+        return ''
+
+
+def get_output_backend(output):
+    """Maps the OUTPUT flag of a phase to a backend, False disables output."""
+    if output is True:
+        return DiskOutput()
+    if not output:
+        return None
+    return output
@@ -0,0 +1,254 @@
+from array import array
+from collections import deque
+from .grammar import GrammarString
+
+# Prefixes of anytree's ContStyle, used by RenderTree
+VERTICAL = '│   '
+CONTINUE = '├── '
+END = '└── '
+BLANK = '    '
+
+GRAMMAR_STRINGS = tuple(GrammarString)
+GRAMMAR_KINDS = {grammar_string: kind for kind, grammar_string in enumerate(GRAMMAR_STRINGS)}
+# Kind of the nodes named by a token, such as (ID, a) or $
+TOKEN = len(GRAMMAR_STRINGS)
+# Missing parent, child or sibling
+NONE = -1
+
+
+class CompactParseTree(object):
+    """
+    Parse tree kept in parallel arrays indexed by node. A node's kind is
+    the index of its GrammarString or TOKEN, parent, first child and next
+    sibling are node indexes or NONE, and token indexes the text of TOKEN
+    nodes. Nodes are only ever appended, node 0 is the root.
+    """
+
+    def __init__(self):
+        self._kinds = array('h')
+        self._parents = array('i')
+        self._first_children = array('i')
+        self._last_children = array('i')
+        self._next_siblings = array('i')
+        self._tokens = array('i')
+        self._texts = []
+
+    def __len__(self):
+        return len(self._kinds)
+
+    def __repr__(self):
+        return "CompactParseTree(%d nodes)" % len(self._kinds)
+
+    def add(self, node, parent=NONE):
+        """Appends a GrammarString or token text as the last child of parent."""
+        index = len(self._kinds)
+        if isinstance(node, GrammarString):
+            self._kinds.append(GRAMMAR_KINDS[node])
+            self._tokens.append(NONE)
+        else:
+            self._kinds.append(TOKEN)
+            self._tokens.append(len(self._texts))
+            self._texts.append(node)
+        self._parents.append(parent)
+        self._first_children.append(NONE)
+        self._last_children.append(NONE)
+        self._next_siblings.append(NONE)
+        if parent != NONE:
+            previous = self._last_children[parent]
+            if previous == NONE:
+                self._first_children[parent] = index
+            else:
+                self._next_siblings[previous] = index
+            self._last_children[parent] = index
+        return index
+
+    def get_kind(self, index):
+        return self._kinds[index]
+
+    def get_parent(self, index):
+        return self._parents[index]
+
+    def get_first_child(self, index):
+        return self._first_children[index]
+
+    def get_next_sibling(self, index):
+        return self._next_siblings[index]
+
+    def get_name(self, index):
+        kind = self._kinds[index]
+        if kind == TOKEN:
+            return self._texts[self._tokens[index]]
+        return GRAMMAR_STRINGS[kind].value
+
+    def get_node(self, index):
+        return ParseTreeView(self, index)
+
+    def get_root(self):
+        return ParseTreeView(self, 0) if self._kinds else None
+
+    def render(self):
+        """
+        Yields (prefix, name) for every node under the root in the order and
+        with the prefixes of anytree's RenderTree, without recursion.
+        """
+        if not self._kinds:
+            return
+        first_children = self._first_children
+        next_siblings = self._next_siblings
+        get_name = self.get_name
+        yield '', get_name(0)
+        stack = []
+        if first_children[0] != NONE:
+            stack.append((first_children[0], ''))
+        while stack:
+            index, fill = stack.pop()
+            sibling = next_siblings[index]
+            if sibling == NONE:
+                yield fill + END, get_name(index)
+                fill += BLANK
+            else:
+                # The sibling is rendered after the subtree of index
+                stack.append((sibling, fill))
+                yield fill + CONTINUE, get_name(index)
+                fill += VERTICAL
+            if first_children[index] != NONE:
+                stack.append((first_children[index], fill))
+
+
+class ParseTreeView(object):
+    """Node of a CompactParseTree, created on demand for traversal."""
+
+    __slots__ = ('_tree', '_index')
+
+    def __init__(self, tree, index):
+        self._tree = tree
+        self._index = index
+
+    def __repr__(self):
+        return "ParseTreeView(%d, %s)" % (self._index, self.get_name())
+
+    def __eq__(self, other):
+        return isinstance(other, ParseTreeView) and (
+            self._tree is other._tree and self._index == other._index)
+
+    def __hash__(self):
+        return hash((id(self._tree), self._index))
+
+    def get_index(self):
+        return self._index
+
+    def get_kind(self):
+        return self._tree.get_kind(self._index)
+
+    def get_name(self):
+        return self._tree.get_name(self._index)
+
+    def get_parent(self):
+        parent = self._tree.get_parent(self._index)
+        return ParseTreeView(self._tree, parent) if parent != NONE else None
+
+    def get_children(self):
+        children = []
+        child = self._tree.get_first_child(self._index)
+        while child != NONE:
+            children.append(ParseTreeView(self._tree, child))
+            child = self._tree.get_next_sibling(child)
+        return children
+
+
+class ParseTreeWriter(object):
+    """
+    Writes the lines of CompactParseTree.render() to a sink while the tree
+    is being built, without keeping the tree. Nodes are added in preorder
+    with the number of children they will get, or None if that is not
+    known. A prefix depends on whether the node and its ancestors are last
+    children, so a line is written as soon as that is known and only the
+    open path and the lines waiting on it are kept in memory.
+    """
+
+    def __init__(self, sink):
+        self._sink = sink
+        self._count = 0
+        # [index, last, children, added, last child, rendered] per open node,
+        # last is a one item list so the lines waiting on it share it
+        self._path = []
+        # Prefix of the children of the last open node
+        self._fill = ''
+        # Open nodes not known to be last or not
+        self._unknown = 0
+        # (lasts, name) of the lines not written yet
+        self._pending = deque()
+
+    def __repr__(self):
+        return "ParseTreeWriter(%r)" % self._sink
+
+    def __len__(self):
+        return self._count
+
+    def _close_to(self, parent):
+        """Closes the open nodes below parent, their last children are known."""
+        path = self._path
+        while path and path[-1][0] != parent:
+            entry = path.pop()
+            if path:
+                self._fill = self._fill[:-len(BLANK)]
+            if entry[1][0] is None:
+                self._unknown -= 1
+            if entry[4] is not None and entry[4][0] is None:
+                entry[4][0] = True
+
+    def add(self, node, parent=NONE, children=None):
+        """Adds a GrammarString or token text under parent, returns its index."""
+        index = self._count
+        self._count += 1
+        self._close_to(parent)
+        path = self._path
+        if parent == NONE:
+            # Only the first root is rendered, like anytree does
+            last = [True]
+            rendered = index == 0
+        else:
+            entry = path[-1]
+            if entry[4] is not None and entry[4][0] is None:
+                entry[4][0] = False
+            last = [None if entry[2] is None else entry[3] == entry[2] - 1]
+            entry[3] += 1
+            entry[4] = last
+            rendered = entry[5]
+        path.append([index, last, children, 0, None, rendered])
+        if last[0] is None:
+            self._unknown += 1
+        fill = self._fill
+        if len(path) > 1:
+            # Only used while no open node is unknown
+            self._fill += VERTICAL if not last[0] else BLANK
+        if rendered:
+            name = node.value if isinstance(node, GrammarString) else node
+            if len(path) == 1:
+                self._pending.append(((), name))
+            elif self._unknown or self._pending:
+                self._pending.append((tuple(entry[1] for entry in path[1:]), name))
+            else:
+                self._sink.write("%s%s%s\n" % (fill, END if last[0] else CONTINUE, name))
+        if self._pending:
+            self._write_known()
+        return index
+
+    def _write_known(self):
+        pending = self._pending
+        while pending:
+            lasts, name = pending[0]
+            if any(last[0] is None for last in lasts):
+                return
+            pending.popleft()
+            if lasts:
+                prefix = ''.join([BLANK if last[0] else VERTICAL for last in lasts[:-1]])
+                prefix += END if lasts[-1][0] else CONTINUE
+            else:
+                prefix = ''
+            self._sink.write("%s%s\n" % (prefix, name))
+
+    def close(self):
+        """Writes the remaining lines, every open node is complete."""
+        self._close_to(NONE)
+        self._write_known()
@@ -1,40 +1,76 @@
 import sys
-import os
-from anytree import Node, RenderTree
 from .token import TokenType
 from .grammar import GrammarString, ActionSymbol
 from .semantic_analyzer import SemanticAnalyzer
-from .symbol import SymbolTable
+from .parse_tree import CompactParseTree, ParseTreeWriter, NONE
+from .output import NullSink
+from .ll1 import get_parse_table, terminal_of, END, TERMINAL, NONTERMINAL
 
 
 class Parser():
 
-    _parse_tree_file = './output/parse_tree.txt'
-    _syntax_errors_file = "./output/syntax_errors.txt"
+    _parse_tree_file = 'parse_tree.txt'
+    _syntax_errors_file = "syntax_errors.txt"
 
     def __init__(self, lexer, **kwargs):
         self._nodes = []
+        self._node_count = 0
         self._syntax_errors = []
         self._parse_tree_root = None
         self._current_node = None
         self._lookahead_token = None
         self._lexer = lexer
-        self._symbol_table = SymbolTable()
+        # The scanner's context is shared by the whole compilation
+        self._context = kwargs.get('CONTEXT') or self._lexer.get_context()
+        self._symbol_table = self._context.get_symbol_table()
         self.DEBUG = kwargs.get('DEBUG', False)
-        self._analyzer = SemanticAnalyzer(DEBUG=self.DEBUG)
         self.OUTPUT = kwargs.get('OUTPUT', True)
+        self.OPTIMIZE = kwargs.get('OPTIMIZE', False)
+        self._analyzer = SemanticAnalyzer(
+            DEBUG=self.DEBUG, CONTEXT=self._context, OPTIMIZE=self.OPTIMIZE)
+        engines = {
+            'recursive': self._parse_recursive,
+            'll1': self._parse_ll1
+        }
+        self.PARSER = kwargs.get('PARSER', 'recursive')
+        if self.PARSER not in engines:
+            print('Invalid parser engine %s' % self.PARSER)
+            sys.exit(1)
+        self._parse = engines[self.PARSER]
+        # 'compact' keeps the tree in a CompactParseTree, 'full' builds
+        # anytree nodes, 'stream' writes parse_tree.txt while parsing
+        # without keeping the tree and 'none' only counts the nodes
+        trees = {
+            'full': self._add_node,
+            'compact': self._add_compact_node,
+            'stream': self._stream_node,
+            'none': self._count_node
+        }
+        self.TREE = kwargs.get('TREE', 'compact')
+        if self.TREE not in trees:
+            print('Invalid parse tree mode %s' % self.TREE)
+            sys.exit(1)
+        self._add_parse_tree_node = trees[self.TREE]
+        self._tree = CompactParseTree() if self.TREE == 'compact' else None
+        self._writer = None
+        if self.TREE == 'full':
+            # anytree is only loaded when its nodes are asked for
+            import anytree
+            self._anytree = anytree
 
         self._lookahead_token = self._lexer.get_next_token()
         # Clear files
         if self.OUTPUT:
-            try:
-                os.mkdir('./output')
-            except FileExistsError:
-                pass
-            with open(self._parse_tree_file, 'w') as _parse_tree_file:
-                _parse_tree_file.write("")
-            with open(self._syntax_errors_file, 'w') as syntax_errors_file:
-                syntax_errors_file.write("")
+            if self.TREE != 'none':
+                self._parse_tree_sink = self._context.open(
+                    self._parse_tree_file, self.OUTPUT)
+            self._syntax_errors_sink = self._context.open(
+                self._syntax_errors_file, self.OUTPUT)
+        if self.TREE == 'stream':
+            # Predicts how many children a node gets to write its line early
+            self._table = get_parse_table()
+            self._writer = ParseTreeWriter(
+                self._parse_tree_sink if self.OUTPUT else NullSink(self._parse_tree_file))
 
         # start parsing!
         self.__call__()
@@ -47,54 +83,137 @@ class Parser():
             print(args)
 
     def __call__(self):
+        try:
+            try:
+                self._parse()
+            except Exception:
+                # Lines streamed so far are dropped like the rest of the tree
+                if self._writer is not None and self.OUTPUT:
+                    self._parse_tree_sink.overwrite('')
+                raise
+            if self._lookahead_token.get_type() == TokenType.EOF:
+                self._add_parse_tree_node(
+                    TokenType.EOF.value, self._parse_tree_root)
+            self._write_parse_tree()
+            if len(self._syntax_errors) == 0:
+                self._write_empty_syntax_error()
+        finally:
+            # Files of every phase are flushed once, even on a syntax error
+            self.close_output()
+        return 0
+
+    def _parse_recursive(self):
         while self._lookahead_token.get_type() != TokenType.EOF:
             self.program()
 
-        if self._lookahead_token.get_type() == TokenType.EOF:
-            self._add_parse_tree_node(
-                TokenType.EOF.value, self._parse_tree_root)
-        self._write_parse_tree()
-        if len(self._syntax_errors) == 0:
-            self._write_empty_syntax_error()
-        return 0
+    def _parse_ll1(self):
+        """
+        Predictive parsing with the LL(1) table of c-minus-grammar.txt and an
+        explicit stack, so nesting depth is not limited by recursion.
+        """
+        table = get_parse_table()
+        rows = table.get_rows()
+        code_gen = self._analyzer.code_gen
+        add_node = self._add_parse_tree_node
+        next_token = self._lexer.get_next_token
+        token = self._lookahead_token
+        terminal = terminal_of(token)
+        stack = [(NONTERMINAL, table.get_start(), None)]
+        while stack:
+            kind, symbol, parent = stack.pop()
+            if kind == NONTERMINAL:
+                body = rows[symbol].get(terminal)
+                if body is None:
+                    raise Exception('Invalid syntax')
+                node = add_node(symbol, parent)
+                if body:
+                    stack.extend((kind, symbol, node) for kind, symbol in body)
+                else:
+                    add_node(GrammarString.EPSILON, node)
+            elif kind == TERMINAL:
+                if symbol != terminal:
+                    raise Exception('Invalid syntax')
+                add_node("(%s, %s)" % (token.get_type().name, token.get_lexeme()), parent)
+                token = self._lookahead_token = next_token()
+                terminal = terminal_of(token)
+            else:
+                code_gen(symbol, token.get_lexeme())
+        if terminal != END:
+            raise Exception('Invalid syntax')
 
-    def _add_parse_tree_node(self, node, parent):
+    def close_output(self):
+        self._analyzer.close_output()
+        self._context.close_output()
+
+    def get_context(self):
+        return self._context
+
+    def get_analyzer(self):
+        return self._analyzer
+
+    def _add_node(self, node, parent):
         value = node.value if isinstance(node, GrammarString) else node
-        new_node = Node(value, parent)
+        new_node = self._anytree.Node(value, parent)
         if self._parse_tree_root == None and parent == None:
             self._parse_tree_root = new_node
         self._nodes.append(new_node)
+        self._node_count += 1
+        return new_node
+
+    def _add_compact_node(self, node, parent):
+        if parent is None:
+            new_node = self._tree.add(node, NONE)
+            if self._parse_tree_root is None:
+                self._parse_tree_root = new_node
+        else:
+            new_node = self._tree.add(node, parent)
+        self._node_count += 1
         return new_node
 
+    def _stream_node(self, node, parent):
+        children = 0
+        if isinstance(node, GrammarString) and node != GrammarString.EPSILON:
+            children = self._table.get_size(node, terminal_of(self._lookahead_token))
+            if parent is None and children is not None:
+                # The EOF node is added under the root after parsing
+                children += 1
+        self._node_count += 1
+        if parent is not None:
+            return self._writer.add(node, parent, children)
+        new_node = self._writer.add(node, NONE, children)
+        if self._parse_tree_root is None:
+            self._parse_tree_root = new_node
+        return new_node
+
+    def _count_node(self, node, parent):
+        self._node_count += 1
+
     def _write_syntax_error(self, row, error):
         self._syntax_errors.append((row, error))
         if self.OUTPUT:
-            try:
-                with open(self._syntax_errors_file, 'a+') as syntax_errors_file:
-                    syntax_errors_file.write(
-                        "#%d : syntax error, %s \n" % (row, error))
-            except IOError:
-                print("Could not write syntax error for row %d" % row)
-                sys.exit(1)
+            self._syntax_errors_sink.write(
+                "#%d : syntax error, %s \n" % (row, error))
 
     def _write_empty_syntax_error(self):
         if self.OUTPUT:
-            try:
-                with open(self._syntax_errors_file, 'w') as syntax_errors_file:
-                    syntax_errors_file.write("There is no syntax error.")
-            except IOError:
-                print("Could not write empty syntax error")
-                sys.exit(1)
+            self._syntax_errors_sink.overwrite("There is no syntax error.")
+
+    def _render_parse_tree(self):
+        """Yields (prefix, name) for every line of parse_tree.txt."""
+        if self.TREE == 'compact':
+            return self._tree.render()
+        if self.TREE == 'full':
+            return ((pre, node.name) for pre, _fill, node in
+                    self._anytree.RenderTree(self._parse_tree_root))
+        return iter(())
 
     def _write_parse_tree(self):
-        if self.OUTPUT:
-            try:
-                with open(self._parse_tree_file, 'w') as parse_tree_file:
-                    for pre, _fill, node in RenderTree(self._parse_tree_root):
-                        parse_tree_file.write("%s%s\n" % (pre, node.name))
-            except IOError:
-                print("Could not write parse tree")
-                sys.exit(1)
+        if self._writer is not None:
+            self._writer.close()
+        elif self.OUTPUT and self.TREE != 'none':
+            self._parse_tree_sink.overwrite('')
+            for pre, name in self._render_parse_tree():
+                self._parse_tree_sink.write("%s%s\n" % (pre, name))
 
     # For testing purposes
     def get_syntax_errors(self):
@@ -102,10 +221,13 @@ class Parser():
 
     # For testing purposes
     def get_parse_tree(self):
-        output = ""
-        for pre, _fill, node in RenderTree(self._parse_tree_root):
-            output += "%s%s\n" % (pre, node.name)
-        return output
+        return ''.join(["%s%s\n" % (pre, name) for pre, name in self._render_parse_tree()])
+
+    def get_node_count(self):
+        return self._node_count
+
+    def get_tree(self):
+        return self._tree
 
     def match(self, expected_token, parent_node):
         if isinstance(expected_token, TokenType) and self._lookahead_token.get_type() == expected_token or isinstance(expected_token, str) and self._lookahead_token.get_lexeme() == expected_token:
@@ -424,6 +546,8 @@ class Parser():
             self.match('[', new_node)
             self.expression(new_node)
             self.match(']', new_node)
+            self._analyzer.code_gen(
+                ActionSymbol.ACCESS_ARRAY, self._lookahead_token.get_lexeme())
             self.h(new_node)
         elif self._lookahead_token.get_lexeme() in ('(', '*', '+', '-', '<', '==', ';', ')', ']', ','):
             self.simple_expression_prime(new_node)
@@ -613,6 +737,8 @@ class Parser():
             self.match('[', new_node)
             self.expression(new_node)
             self.match(']', new_node)
+            self._analyzer.code_gen(
+                ActionSymbol.ACCESS_ARRAY, self._lookahead_token.get_lexeme())
         elif self._lookahead_token.get_lexeme() in ('*', '+', '-', ';', ')', '<', '==', ']', ','):
             # Do nothing
             self._add_parse_tree_node(
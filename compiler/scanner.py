@@ -1,8 +1,9 @@
 import sys
-import os
+import re
 from enum import Enum
-from .token import Token, TokenType, OPERATORS, RESERVED_KEYWORDS
-from .symbol import Symbol, SymbolTable
+from .token import Token, TokenBlock, TokenType, TOKEN_TYPE_CODES, OPERATORS, RESERVED_KEYWORDS
+from .symbol import Symbol
+from .context import CompilationContext
 
 
 class LexicalError(Enum):
@@ -11,6 +12,121 @@ class LexicalError(Enum):
     UNMATCHED_COMMENT = 'Unmatched */'
     INVALID_NUMBER = 'Invalid number'
 
+
+# Byte classes for the table-driven engine. They are computed with the same
+# predicates the reference engine uses, so both agree on every byte value.
+CLASS_OTHER = 0
+CLASS_LETTER = 1
+CLASS_DIGIT = 2
+CLASS_SYMBOL = 3
+CLASS_WHITESPACE = 4
+CLASS_NEWLINE = 5
+CLASS_SLASH = 6
+
+
+def _classify(byte):
+    character = chr(byte)
+    if byte == 10:
+        return CLASS_NEWLINE
+    if character in OPERATORS:
+        return CLASS_SYMBOL
+    if character.isalpha():
+        return CLASS_LETTER
+    if character.isdigit():
+        return CLASS_DIGIT
+    if character == '/':
+        return CLASS_SLASH
+    if character.isspace():
+        return CLASS_WHITESPACE
+    return CLASS_OTHER
+
+
+BYTE_CLASSES = bytes(_classify(byte) for byte in range(256))
+
+# Scanner states, each one is a row of the transition table below
+STATE_START = 0
+STATE_ID = 1
+STATE_NUM = 2
+STATE_INVALID = 3
+STATE_LINE_COMMENT = 4
+
+# Transition actions
+ACTION_CONTINUE = 0
+ACTION_ACCEPT = 1
+ACTION_REJECT = 2
+ACTION_NEWLINE = 3
+ACTION_WHITESPACE = 4
+ACTION_COMMENT = 5
+ACTION_SYMBOL = 6
+ACTION_ID = 7
+ACTION_NUM = 8
+
+# TRANSITIONS[state][byte_class] -> action
+TRANSITIONS = (
+    # STATE_START
+    bytes((ACTION_REJECT, ACTION_ID, ACTION_NUM, ACTION_SYMBOL,
+           ACTION_WHITESPACE, ACTION_NEWLINE, ACTION_COMMENT)),
+    # STATE_ID
+    bytes((ACTION_REJECT, ACTION_CONTINUE, ACTION_CONTINUE, ACTION_ACCEPT,
+           ACTION_ACCEPT, ACTION_ACCEPT, ACTION_REJECT)),
+    # STATE_NUM
+    bytes((ACTION_ACCEPT, ACTION_REJECT, ACTION_CONTINUE, ACTION_ACCEPT,
+           ACTION_ACCEPT, ACTION_ACCEPT, ACTION_ACCEPT)),
+    # STATE_INVALID
+    bytes((ACTION_CONTINUE, ACTION_ACCEPT, ACTION_ACCEPT, ACTION_ACCEPT,
+           ACTION_ACCEPT, ACTION_ACCEPT, ACTION_ACCEPT)),
+    # STATE_LINE_COMMENT
+    bytes((ACTION_CONTINUE, ACTION_CONTINUE, ACTION_CONTINUE, ACTION_CONTINUE,
+           ACTION_CONTINUE, ACTION_ACCEPT, ACTION_CONTINUE)),
+)
+
+KEYWORDS = frozenset(RESERVED_KEYWORDS)
+MAX_KEYWORD_LENGTH = max(len(keyword) for keyword in RESERVED_KEYWORDS)
+
+_SLASH = ord('/')
+_STAR = ord('*')
+_EQUALS = ord('=')
+_NEWLINE = ord('\n')
+
+
+def _byte_set(*byte_classes):
+    return b'[' + b''.join(re.escape(bytes((byte,))) for byte in range(256)
+                           if BYTE_CLASSES[byte] in byte_classes) + b']'
+
+
+# Master pattern of the regex engine. Only matches that the reference engine
+# scans without peeking ahead are lexed here; block comments and anything
+# that ends in a lexical error are handed to the table-driven routines.
+# The pattern is applied with endpos at the last readable byte, which makes
+# \Z behave like the reference engine's end of content.
+MASTER_PATTERN = re.compile(b'|'.join((
+    b'(?P<NEWLINE>\n(?!\Z))',
+    b'(?P<WHITESPACE>' + _byte_set(CLASS_WHITESPACE) + b'+)(?!\\Z)',
+    b'(?P<LINE_COMMENT>//[^\n]*\n?)',
+    b'(?P<COMMENT>/\*)',
+    b'(?P<KEYWORD>' + b'|'.join(keyword.encode() for keyword in RESERVED_KEYWORDS) + b')',
+    b'(?P<ID>' + _byte_set(CLASS_LETTER) + _byte_set(CLASS_LETTER, CLASS_DIGIT) + b'*)'
+    b'(?=' + _byte_set(CLASS_SYMBOL, CLASS_WHITESPACE, CLASS_NEWLINE) + b'|\Z)',
+    b'(?P<NUM>' + _byte_set(CLASS_DIGIT) + b'+)(?!' + _byte_set(CLASS_LETTER, CLASS_DIGIT) + b')',
+    b'(?P<SYMBOL>' + _byte_set(CLASS_SYMBOL) + b'=?)',
+    b'(?P<INVALID>.)'
+)), re.DOTALL)
+
+_GROUP_NEWLINE = MASTER_PATTERN.groupindex['NEWLINE']
+_GROUP_WHITESPACE = MASTER_PATTERN.groupindex['WHITESPACE']
+_GROUP_LINE_COMMENT = MASTER_PATTERN.groupindex['LINE_COMMENT']
+_GROUP_COMMENT = MASTER_PATTERN.groupindex['COMMENT']
+_GROUP_KEYWORD = MASTER_PATTERN.groupindex['KEYWORD']
+_GROUP_ID = MASTER_PATTERN.groupindex['ID']
+_GROUP_NUM = MASTER_PATTERN.groupindex['NUM']
+_GROUP_SYMBOL = MASTER_PATTERN.groupindex['SYMBOL']
+_GROUP_CODES = {
+    _GROUP_KEYWORD: TOKEN_TYPE_CODES[TokenType.KEYWORD],
+    _GROUP_NUM: TOKEN_TYPE_CODES[TokenType.NUM],
+    _GROUP_SYMBOL: TOKEN_TYPE_CODES[TokenType.SYMBOL]
+}
+
+
 class Scanner():
 
     def __init__(self, content, **kwargs):
@@ -20,44 +136,125 @@ class Scanner():
         self._current_token_column = 0
         self._input = content
         self._tokens = []
-        self._symbol_table = SymbolTable()
+        # Appends of the TokenBlock arrays being filled by token_blocks(),
+        # the engines append to them instead of building records
+        self._block_appends = None
+        self._lexical_errors = []
         self.OUTPUT = kwargs.get('OUTPUT', True)
+        self._context = kwargs.get('CONTEXT') or CompilationContext(**kwargs)
+        self._symbol_table = self._context.get_symbol_table()
+        engines = {
+            'reference': self._reference_tokens,
+            'table': self._table_tokens,
+            'regex': self._regex_tokens
+        }
+        self.ENGINE = kwargs.get('ENGINE', 'reference')
+        if self.ENGINE not in engines:
+            print('Invalid scanner engine %s' % self.ENGINE)
+            sys.exit(1)
+        # Token records: (type, lexeme, start, end, row, column), nothing
+        # useful while token_blocks() fills a block
+        self._stream = engines[self.ENGINE]()
+        # Scans one token, the regex engine keeps its position in the stream
+        self._step = {
+            'reference': self._get_next_token_reference,
+            'table': self._get_next_token_table,
+            'regex': self._stream.__next__
+        }[self.ENGINE]
         # Clear files
         if self.OUTPUT:
-            try:
-                os.mkdir('./output')
-            except FileExistsError:
-                pass
-            with open(self._tokens_file, 'w') as tokens_file:
-                tokens_file.write("")
-            with open(self._lexical_errors_file, 'w') as lexical_errors_file:
-                lexical_errors_file.write("")
+            self._tokens_sink = self._context.open(
+                self._tokens_file, self.OUTPUT)
+            self._lexical_errors_sink = self._context.open(
+                self._lexical_errors_file, self.OUTPUT)
 
     def __call__(self):
         return self.get_next_token()
 
-    _lexical_errors_file = "./output/lexical_errors.txt"
-    _tokens_file = './output/tokens.txt'
+    def close(self):
+        # Releases the regex engine's hold on the input buffer
+        self._stream.close()
+        self.close_output()
+
+    def close_output(self):
+        if self.OUTPUT:
+            self._tokens_sink.close()
+            self._lexical_errors_sink.close()
+
+    _lexical_errors_file = "lexical_errors.txt"
+    _tokens_file = 'tokens.txt'
+
+    def get_context(self):
+        return self._context
+
+    _token_block_size = 1024
 
     def get_next_token(self):
-        current_char = self._get_next_char()
-        next_token = None
-
-        if self._is_symbol(current_char):
-            # Symbol has to come before is_letter!
-            next_token = self._create_symbol_token(current_char)
-        elif self._is_letter(current_char):
-            next_token = self._create_id_or_keyword_token(current_char)
-        elif self._is_digit(current_char):
-            next_token = self._create_num_token(current_char)
-
-        if next_token:
-            return next_token
-
-        if self._is_end_of_content():
-            return self._create_eof_token()
-        self.create_lexical_error(current_char)
-        return self.get_next_token()
+        token_type, lexeme, _start, _end, row, column = next(self._stream)
+        return Token(row, column, token_type, lexeme)
+
+    def tokens(self):
+        """Yields the remaining tokens up to and including EOF."""
+        for token_type, lexeme, _start, _end, row, column in self._stream:
+            yield Token(row, column, token_type, lexeme)
+            if token_type is TokenType.EOF:
+                return
+
+    def token_blocks(self, size=None):
+        """
+        Yields the remaining tokens up to and including EOF as TokenBlocks
+        of at most size tokens. The engines append to the block directly,
+        without a record or a Token for each token.
+        """
+        size = size or self._token_block_size
+        eof = TOKEN_TYPE_CODES[TokenType.EOF]
+        step = self._step
+        while True:
+            block = TokenBlock(self._input)
+            types = block.types
+            self._block_appends = (types.append, block.starts.append, block.ends.append,
+                                   block.rows.append, block.columns.append)
+            try:
+                # Every step appends one token
+                while True:
+                    step()
+                    if types[-1] == eof or len(types) == size:
+                        break
+            finally:
+                self._block_appends = None
+            yield block
+            if types[-1] == eof:
+                return
+
+    # For testing purposes
+    def get_lexical_errors(self):
+        return self._lexical_errors
+
+    def _reference_tokens(self):
+        while True:
+            yield self._get_next_token_reference()
+
+    def _get_next_token_reference(self):
+        while True:
+            current_char = self._get_next_char()
+            next_token = None
+
+            if self._is_symbol(current_char):
+                # Symbol has to come before is_letter!
+                next_token = self._create_symbol_token(current_char)
+            elif self._is_letter(current_char):
+                next_token = self._create_id_or_keyword_token(current_char)
+            elif self._is_digit(current_char):
+                next_token = self._create_num_token(current_char)
+
+            if next_token:
+                return next_token
+
+            if self._is_end_of_content():
+                return self._create_eof_token()
+            # Retry after the error instead of recursing, a long run of
+            # errors must not hit the recursion limit
+            self.create_lexical_error(current_char)
 
     def create_lexical_error(self, character):
         if chr(character) == '*' and chr(self._peek_next_char()) == '/':
@@ -66,26 +263,20 @@ class Scanner():
             # Consume the following character '/'
             self._read_next_char()
             return
-        invalid_input = ""
-        current_char = character
+        start = self._current_char_index
         while True:
             next_char = self._peek_next_char()
-            invalid_input += chr(current_char)
             if self._is_symbol(next_char) or self._is_letter(next_char) or self._is_digit(next_char) or chr(next_char) == '/' or self._is_whitespace(next_char) or self._is_end_of_content():
                 break
-            current_char = self._read_next_char()
+            self._read_next_char()
         self._write_lexical_error(
-            self._current_row, invalid_input, LexicalError.INVALID_INPUT)
+            self._current_row, chr(character) + self._get_lexeme(start), LexicalError.INVALID_INPUT)
 
     def _write_lexical_error(self, row, input, error):
+        self._lexical_errors.append((row, input, error))
         if self.OUTPUT:
-            try:
-                with open(self._lexical_errors_file, 'a+') as lexical_errors_file:
-                    lexical_errors_file.write(
-                        "%d. (%s, %s) \n" % (row, input, error))
-            except IOError:
-                print("Could not write lexical error for row %d" % row)
-                sys.exit(1)
+            self._lexical_errors_sink.write(
+                "%d. (%s, %s) \n" % (row, input, error))
 
     def skip_comment(self):
         # Consume the first /
@@ -117,27 +308,25 @@ class Scanner():
                         self._current_row-multiline_count, '/*', LexicalError.UNCLOSED_COMMENT)
                     break
                 elif self._is_end_of_line(current_char):
-                    continue
+                    self._next_row()
                 next_peek = self._peek_next_char()
                 current_char = self._read_next_char()
 
     def _get_next_char(self):
-        self._current_token_column = self._current_column
-        next_char = self._peek_next_char()
-        current_char = self._read_next_char()
+        while True:
+            self._current_token_column = self._current_column
+            next_char = self._peek_next_char()
+            current_char = self._read_next_char()
 
-        if self._is_end_of_content():
-            return current_char
-        elif self._skip_whitespace_eol(current_char):
-            return self._get_next_char()
-        elif self._is_comment(current_char, next_char):
-            self.skip_comment()
-            return self._get_next_char()
-        elif self._is_end_of_line(current_char):
-            self._next_row()
-            return self._get_next_char()
+            if self._is_end_of_content():
+                return current_char
+            elif self._skip_whitespace_eol(current_char):
+                continue
+            elif self._is_comment(current_char, next_char):
+                self.skip_comment()
+                continue
 
-        return current_char
+            return current_char
 
     def _skip_whitespace_eol(self, current_char):
         if self._is_end_of_line(current_char):
@@ -194,13 +383,35 @@ class Scanner():
             return self._input[self._current_char_index + 1]
         return 0
 
-    def create_token(self, token_type, lexeme):
-        token = Token(self._current_row,
-                      self._current_token_column, token_type, lexeme)
-        self._tokens.append((token.get_type().name, lexeme))
-        if token_type == TokenType.ID:
-            self._symbol_table.insert(Symbol(lexeme))
-        return token
+    def create_token(self, token_type, lexeme, start=None, end=None):
+        """
+        Returns the record of a token ending at end, the current index by
+        default, or True once it is appended to the block being filled. A
+        lexeme of None is input[start:end], it is only decoded when the
+        record, the symbol table or tokens.txt needs it.
+        """
+        if end is None:
+            end = self._current_char_index
+        if start is None:
+            start = end - len(lexeme)
+        appends = self._block_appends
+        if appends is None or self.OUTPUT or token_type is TokenType.ID:
+            if lexeme is None:
+                lexeme = str(self._input[start:end], 'latin-1')
+            if self.OUTPUT:
+                self._tokens.append((token_type.name, lexeme))
+            if token_type is TokenType.ID:
+                self._symbol_table.insert(Symbol(lexeme))
+        if appends is None:
+            return (token_type, lexeme, start, end, self._current_row, self._current_token_column)
+        append_type, append_start, append_end, append_row, append_column = appends
+        append_type(TOKEN_TYPE_CODES[token_type])
+        append_start(start)
+        append_end(end)
+        append_row(self._current_row)
+        append_column(self._current_token_column)
+        # Not None, which the engines take for a lexical error
+        return True
 
     def _create_symbol_token(self, character):
         if chr(self._get_current_char()) == '=':
@@ -210,57 +421,320 @@ class Scanner():
         return self.create_token(TokenType.SYMBOL, chr(character))
 
     def _create_num_token(self, character):
-        lexeme = chr(character)
-        current_char = character
+        start = self._current_char_index - 1
         while self._is_digit(self._get_current_char()):
-            current_char = self._read_next_char()
-            lexeme += chr(current_char)
+            self._read_next_char()
         if self._is_letter(self._get_current_char()):
-            current_char = self._read_next_char()
-            lexeme += chr(current_char)
+            self._read_next_char()
             self._write_lexical_error(
-                self._current_row, lexeme, LexicalError.INVALID_NUMBER)
+                self._current_row, self._get_lexeme(start), LexicalError.INVALID_NUMBER)
             return  # Raise error and create separate error handler?
-        return self.create_token(TokenType.NUM, lexeme)
+        return self.create_token(TokenType.NUM, self._get_lexeme(start))
 
     def _create_eof_token(self):
-        return self.create_token(TokenType.EOF, '$')
+        # Nothing is written after the end of the input
+        self.close_output()
+        return self.create_token(TokenType.EOF, '$', self._current_char_index)
 
     def _create_id_or_keyword_token(self, character):
-        lexeme = ""
-        current_char = character
+        start = self._current_char_index - 1
         while True:
-            lexeme += chr(current_char)
             next_char = self._get_current_char()
-            if lexeme in RESERVED_KEYWORDS:
-                return self.create_token(TokenType.KEYWORD, lexeme)
+            if self._current_char_index - start <= MAX_KEYWORD_LENGTH:
+                lexeme = self._get_lexeme(start)
+                if lexeme in RESERVED_KEYWORDS:
+                    return self.create_token(TokenType.KEYWORD, lexeme)
             if not self._is_digit(next_char) and not self._is_letter(next_char):
                 if not self._is_end_of_keyword_or_identifier(next_char):
-                    lexeme += chr(next_char)
-                    self._write_lexical_error(
-                        self._current_row, lexeme, LexicalError.INVALID_INPUT)
                     self._read_next_char()
+                    self._write_lexical_error(
+                        self._current_row, self._get_lexeme(start), LexicalError.INVALID_INPUT)
                     return
                 break
-            current_char = self._read_next_char()
-        return self.create_token(TokenType.ID, lexeme)
+            self._read_next_char()
+        return self.create_token(TokenType.ID, self._get_lexeme(start))
+
+    def _get_lexeme(self, start, end=None):
+        """Decode input[start:end] without copying the whole input, end defaults to the current index."""
+        if end is None:
+            end = self._current_char_index
+        return str(self._input[start:end], 'latin-1')
 
     def _write_tokens_file(self):
-        output = ""
-        for token_type, token_string in self._tokens:
-            output += " (%s, %s)" % (token_type, token_string)
+        if self.OUTPUT and self._tokens:
+            output = "".join([" (%s, %s)" % (token_type, token_string)
+                              for token_type, token_string in self._tokens])
+            self._tokens_sink.write("%d. %s \n" % (self._current_row, output))
         self._tokens.clear()
 
-        if output != "":
-            try:
-                with open(self._tokens_file, 'a+') as tokens_file:
-                    tokens_file.write("%d. %s \n" %
-                                      (self._current_row, output))
-            except IOError:
-                print("Could not write tokens for row %d" % self._current_row)
-                sys.exit(1)
-
     def _next_row(self):
         self._write_tokens_file()
         self._current_row += 1
         self._current_column = 0
+
+    # Table-driven engine
+    # Produces the same tokens and lexical errors as the reference engine,
+    # but classifies bytes with BYTE_CLASSES and TRANSITIONS instead of chr()
+
+    def _table_tokens(self):
+        while True:
+            yield self._get_next_token_table()
+
+    def _get_next_token_table(self):
+        data = self._input
+        end = len(data) - 1
+        classes = BYTE_CLASSES
+        start_actions = TRANSITIONS[STATE_START]
+        while True:
+            index = self._current_char_index
+            column = self._current_column
+            # Skip whitespace, newlines and comments
+            while True:
+                self._current_token_column = column
+                if index >= end:
+                    current_char = 0
+                    break
+                current_char = data[index]
+                index += 1
+                column += 1
+                if index >= end:
+                    break
+                action = start_actions[classes[current_char]]
+                if action == ACTION_WHITESPACE:
+                    continue
+                if action == ACTION_NEWLINE:
+                    self._current_char_index = index
+                    self._next_row()
+                    column = 0
+                    continue
+                if action == ACTION_COMMENT and data[index] in (_SLASH, _STAR):
+                    self._current_char_index = index
+                    self._current_column = column
+                    self._skip_comment_table()
+                    index = self._current_char_index
+                    column = self._current_column
+                    continue
+                break
+            self._current_char_index = index
+            self._current_column = column
+
+            action = start_actions[classes[current_char]]
+            if action == ACTION_SYMBOL:
+                return self._create_symbol_token_table(current_char)
+            next_token = None
+            if action == ACTION_ID:
+                next_token = self._create_id_or_keyword_token_table()
+            elif action == ACTION_NUM:
+                next_token = self._create_num_token_table()
+            if next_token:
+                return next_token
+
+            if self._current_char_index >= end:
+                return self._create_eof_token()
+            self._create_lexical_error_table(current_char)
+
+    def _create_symbol_token_table(self, character):
+        index = self._current_char_index
+        if index < len(self._input) - 1 and self._input[index] == _EQUALS:
+            # Consume the following character '='
+            self._current_char_index += 1
+            self._current_column += 1
+            return self.create_token(TokenType.SYMBOL, '==')
+        return self.create_token(TokenType.SYMBOL, chr(character))
+
+    def _create_id_or_keyword_token_table(self):
+        data = self._input
+        end = len(data) - 1
+        classes = BYTE_CLASSES
+        id_actions = TRANSITIONS[STATE_ID]
+        start = self._current_char_index - 1
+        index = self._current_char_index
+        while True:
+            if index - start <= MAX_KEYWORD_LENGTH:
+                lexeme = str(data[start:index], 'latin-1')
+                if lexeme in KEYWORDS:
+                    self._advance_to(index)
+                    return self.create_token(TokenType.KEYWORD, lexeme)
+            if index >= end:
+                break
+            action = id_actions[classes[data[index]]]
+            if action == ACTION_CONTINUE:
+                index += 1
+                continue
+            if action == ACTION_REJECT:
+                index += 1
+                self._advance_to(index)
+                self._write_lexical_error(
+                    self._current_row, str(data[start:index], 'latin-1'), LexicalError.INVALID_INPUT)
+                return
+            break
+        self._advance_to(index)
+        return self.create_token(TokenType.ID, None, start, index)
+
+    def _create_num_token_table(self):
+        data = self._input
+        end = len(data) - 1
+        classes = BYTE_CLASSES
+        num_actions = TRANSITIONS[STATE_NUM]
+        start = self._current_char_index - 1
+        index = self._current_char_index
+        action = ACTION_ACCEPT
+        while index < end:
+            action = num_actions[classes[data[index]]]
+            if action != ACTION_CONTINUE:
+                break
+            index += 1
+        if index < end and action == ACTION_REJECT:
+            index += 1
+            self._advance_to(index)
+            self._write_lexical_error(
+                self._current_row, str(data[start:index], 'latin-1'), LexicalError.INVALID_NUMBER)
+            return
+        self._advance_to(index)
+        return self.create_token(TokenType.NUM, None, start, index)
+
+    def _create_lexical_error_table(self, character):
+        data = self._input
+        length = len(data)
+        end = length - 1
+        index = self._current_char_index
+        if character == _STAR and index + 1 < length and data[index + 1] == _SLASH:
+            self._write_lexical_error(
+                self._current_row, '*/', LexicalError.UNMATCHED_COMMENT)
+            # Consume the following character '/'
+            if index < end:
+                self._advance_to(index + 1)
+            return
+        classes = BYTE_CLASSES
+        invalid_actions = TRANSITIONS[STATE_INVALID]
+        start = index
+        # The reference engine decides whether to continue by peeking one
+        # character past the one it consumes next
+        while index < end and invalid_actions[classes[data[index + 1]]] == ACTION_CONTINUE:
+            index += 1
+        self._advance_to(index)
+        self._write_lexical_error(
+            self._current_row, chr(character) + str(data[start:index], 'latin-1'), LexicalError.INVALID_INPUT)
+
+    def _skip_comment_table(self):
+        data = self._input
+        length = len(data)
+        end = length - 1
+        # Consume the second character of the comment opening
+        current_char = data[self._current_char_index]
+        index = self._current_char_index + 1
+        column = self._current_column + 1
+        if current_char == _SLASH:
+            classes = BYTE_CLASSES
+            comment_actions = TRANSITIONS[STATE_LINE_COMMENT]
+            while index < end and comment_actions[classes[data[index - 1]]] == ACTION_CONTINUE:
+                index += 1
+            self._current_char_index = index
+            self._next_row()
+            return
+        # For nested multiline comments, mirroring skip_comment
+        next_peek = data[index + 1] if index + 1 < length else 0
+        multiline_count = 0
+        while True:
+            if current_char == _SLASH and index + 1 < length and data[index + 1] == _STAR:
+                multiline_count += 1
+                if index < end:
+                    index += 1
+                    column += 1
+            elif current_char == _STAR and next_peek == _SLASH:
+                if index < end:
+                    index += 1
+                    column += 1
+                if multiline_count == 0:
+                    break
+                multiline_count -= 1
+            elif index >= end:
+                self._write_lexical_error(
+                    self._current_row-multiline_count, '/*', LexicalError.UNCLOSED_COMMENT)
+                break
+            elif current_char == _NEWLINE:
+                self._current_char_index = index
+                self._next_row()
+                column = 0
+            next_peek = data[index + 1] if index + 1 < length else 0
+            if index < end:
+                current_char = data[index]
+                index += 1
+                column += 1
+            else:
+                current_char = 0
+        self._current_char_index = index
+        self._current_column = column
+
+    def _advance_to(self, index):
+        self._current_column += index - self._current_char_index
+        self._current_char_index = index
+
+    # Regex engine
+    # Lexes the buffer in finditer chunks of MASTER_PATTERN, falling back to
+    # the table-driven engine at positions the pattern leaves to it
+
+    def _regex_tokens(self):
+        data = self._input
+        end = max(len(data) - 1, 0)
+        index = self._current_char_index
+        line_start = index - self._current_column
+        token = None
+        finished = False
+        while not finished:
+            finished = True
+            for match in MASTER_PATTERN.finditer(data, index, end):
+                group = match.lastindex
+                start = match.start()
+                if group == _GROUP_WHITESPACE:
+                    continue
+                if group == _GROUP_NEWLINE or group == _GROUP_LINE_COMMENT:
+                    self._next_row()
+                    line_start = match.end()
+                elif (group == _GROUP_KEYWORD or group == _GROUP_NUM or group == _GROUP_SYMBOL) and (
+                        self._block_appends is not None and not self.OUTPUT):
+                    # Nothing but the block needs these tokens
+                    append_type, append_start, append_end, append_row, append_column = self._block_appends
+                    append_type(_GROUP_CODES[group])
+                    append_start(start)
+                    append_end(match.end())
+                    append_row(self._current_row)
+                    append_column(start - line_start)
+                    yield
+                elif group == _GROUP_KEYWORD or group == _GROUP_ID or group == _GROUP_NUM:
+                    self._current_token_column = start - line_start
+                    yield self.create_token(
+                        (TokenType.ID, TokenType.NUM)[group == _GROUP_NUM] if group != _GROUP_KEYWORD else TokenType.KEYWORD,
+                        None, start, match.end())
+                elif group == _GROUP_SYMBOL:
+                    self._current_token_column = start - line_start
+                    stop = match.end()
+                    yield self.create_token(
+                        TokenType.SYMBOL, '==' if stop - start == 2 else chr(data[start]), start, stop)
+                else:
+                    if group == _GROUP_COMMENT:
+                        # Consume the '/', skipping the rest is left to the table engine
+                        self._current_char_index = start + 1
+                        self._current_column = start + 1 - line_start
+                        self._skip_comment_table()
+                    else:
+                        self._current_char_index = start
+                        self._current_column = start - line_start
+                        token = self._get_next_token_table()
+                    index = self._current_char_index
+                    line_start = index - self._current_column
+                    finished = index >= end
+                    break
+            else:
+                self._current_char_index = end
+                self._current_column = end - line_start
+            # Neither the match iterator nor the last match may outlive the
+            # last token, they keep a buffer export on the input alive and
+            # an mmap input could not be closed
+            match = None
+            if token is not None:
+                yield token
+                token = None
+        while True:
+            self._current_token_column = self._current_column
+            yield self._create_eof_token()
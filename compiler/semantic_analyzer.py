@@ -1,7 +1,9 @@
 import sys
-import os
 from .grammar import ActionSymbol
-from .symbol import SymbolTable
+from .context import CompilationContext
+from .ir import Instruction, format_program
+from .optimizer import optimize
+from .symbol import INT_SIZE
 from enum import Enum, unique
 
 
@@ -76,27 +78,28 @@ class SemanticStack(object):
 
 class SemanticAnalyzer():
 
-    _output_file = './output/output.txt'
-    _errors_file = "./output/semantic_error.txt"
+    _output_file = 'output.txt'
+    _errors_file = "semantic_error.txt"
 
     def __init__(self, **kwargs):
         self._semantic_stack = SemanticStack()
         self._semantic_errors = []
+        # Indexed by line, None marks a slot reserved by SAVE or never filled
         self._program_block = []
+        self._program_block_discarded = False
         self._line_count = 0
-        self._symbol_table = SymbolTable()
+        self._context = kwargs.get('CONTEXT') or CompilationContext(**kwargs)
+        self._symbol_table = self._context.get_symbol_table()
         self.DEBUG = kwargs.get('DEBUG', False)
         self.OUTPUT = kwargs.get('OUTPUT', True)
+        self.OPTIMIZE = kwargs.get('OPTIMIZE', False)
+        self._optimizer_stats = {}
         # Clear files
         if self.OUTPUT:
-            try:
-                os.mkdir('./output')
-            except FileExistsError:
-                pass
-            with open(self._output_file, 'w') as output_file:
-                output_file.write("")
-            with open(self._errors_file, 'w') as errors_file:
-                errors_file.write("")
+            self._output_sink = self._context.open(
+                self._output_file, self.OUTPUT)
+            self._errors_sink = self._context.open(
+                self._errors_file, self.OUTPUT)
 
     def _log(self, output):
         if self.DEBUG:
@@ -158,58 +161,60 @@ class SemanticAnalyzer():
     def _write_semantic_error(self, error):
         self._semantic_errors.append(error)
         if self.OUTPUT:
-            try:
-                with open(self._errors_file, 'a+') as semantic_errors_file:
-                    semantic_errors_file.write(
-                        "%s\n" % error)
-            except IOError:
-                print("Could not write semantic error")
-                sys.exit(1)
+            self._errors_sink.write("%s\n" % error)
 
     def _write_empty_semantic_error(self):
         if self.OUTPUT:
-            try:
-                with open(self._errors_file, 'w') as semantic_errors_file:
-                    semantic_errors_file.write(
-                        "The input program is semantically correct.")
-            except IOError:
-                print("Could not write empty semantic error")
-                sys.exit(1)
+            self._errors_sink.overwrite(
+                "The input program is semantically correct.")
 
     def _write_empty_output(self):
+        self._program_block_discarded = True
         if self.OUTPUT:
-            try:
-                with open(self._output_file, 'w') as output_file:
-                    output_file.write(
-                        "The output code has not been generated")
-            except IOError:
-                print("Could not write empty output file")
-                sys.exit(1)
-
-    def _order_program_block(self, elem):
-        return int(elem.split('\t')[0])
+            self._output_sink.overwrite(
+                "The output code has not been generated")
 
     def _write_address_code(self, **kwargs):
         if len(self._semantic_errors) > 0:
             return self._write_empty_output()
         output_line = kwargs.get('line', self._line_count)
-        arguments = dict(enumerate(kwargs['arguments']))
-        output_string = "{0}\t({1}, {arg[0]}, {arg[1]}, {arg[2]})\n".format(
-            output_line, kwargs.get('operation'), arg=[arguments.get(x, '') for x in range(3)])
-
-        output_line_index = kwargs.get(
-            'line') if 'line' in kwargs else output_line
-        self._program_block.insert(output_line_index, output_string)
-        self._program_block.sort(key=self._order_program_block)
+        instruction = Instruction(
+            output_line, kwargs.get('operation'), kwargs['arguments'])
+
+        program_block = self._program_block
+        if output_line >= len(program_block):
+            # Grow geometrically so that appending stays amortized O(1)
+            program_block.extend(
+                [None] * max(output_line + 1 - len(program_block), len(program_block)))
+        program_block[output_line] = instruction
         if kwargs.get('increment', True):
             self._increment_line_count()
+
+    def _write_program_block(self):
+        if self.OUTPUT and not self._program_block_discarded:
+            self._output_sink.overwrite(self.get_code())
+
+    # For testing purposes
+    def get_program_block(self):
+        program_block = [line for line in self._program_block if line is not None]
+        if self.OPTIMIZE:
+            self._optimizer_stats = {}
+            program_block = optimize(
+                program_block, self._symbol_table, stats=self._optimizer_stats)
+            self._log(self._optimizer_stats)
+        return program_block
+
+    def get_optimizer_stats(self):
+        return self._optimizer_stats
+
+    def get_code(self):
+        return format_program(self.get_program_block())
+
+    def close_output(self):
+        self._write_program_block()
         if self.OUTPUT:
-            try:
-                with open(self._output_file, 'w') as output_file:
-                    output_file.writelines(self._program_block)
-            except IOError:
-                print("Could not write output file")
-                sys.exit(1)
+            self._output_sink.close()
+            self._errors_sink.close()
 
     def _increment_line_count(self, count=1):
         self._line_count += count
@@ -321,34 +326,26 @@ class SemanticAnalyzer():
         return 'PROCESSED PRINT ACTION'
 
     def _action_process_array(self, current_input):
+        # Memory starts zeroed, so the elements need no ASSIGN
         symbol = self._symbol_table.lookup_with_address(
             self._semantic_stack.top())
-        arguments = [self._semantic_stack.top()]
-        self._write_address_code(increment=True, operation=ActionSymbol.ASSIGN.value, arguments=['#0',
-                                                                                                 self._semantic_stack.top()])
-
-        for i in range(int(current_input)-1):
-            address = self._symbol_table.get_address(4)
-            self._write_address_code(increment=True, operation=ActionSymbol.ASSIGN.value, arguments=['#0',
-                                                                                                     address])
-            arguments.append(address)
+        self._symbol_table.allocate_array(symbol, int(current_input))
         self._semantic_stack.pop(1)
-        symbol.set_arguments(arguments)
         return 'PROCESSED PROCESS ARRAY ACTION'
 
     def _action_access_array(self, current_input):
-        if isinstance(self._semantic_stack.top(), str):
-            index = self._semantic_stack.top().replace('#', '')
-            array_address = self._semantic_stack.from_top(1)
-            array_symbol = self._symbol_table.lookup_with_address(
-                array_address)
-            array_element = array_symbol.get_arguments()[int(index)]
-            self._semantic_stack.pop(2)
-            self._semantic_stack.push(array_element)
+        index = self._semantic_stack.top()
+        array_address = self._semantic_stack.from_top(1)
+        if isinstance(index, str) and index.startswith('#'):
+            array_element = array_address + int(index[1:]) * INT_SIZE
         else:
-            index = self._semantic_stack.top()
-            array_address = self._semantic_stack.from_top(1)
-            array_element = index
+            offset_address = self._symbol_table.get_temporary_address()
+            self._write_address_code(operation=ActionSymbol.MULTIPLY.value, arguments=[
+                                     index, '#%d' % INT_SIZE, offset_address])
+            element_address = self._symbol_table.get_temporary_address()
+            self._write_address_code(operation=ActionSymbol.ADDITION.value, arguments=[
+                                     offset_address, '#%d' % array_address, element_address])
+            array_element = '@%d' % element_address
         self._semantic_stack.pop(2)
         self._semantic_stack.push(array_element)
         return 'PROCESSED ACCESS ARRAY ACTION'
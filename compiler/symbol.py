@@ -1,12 +1,4 @@
-class Singleton(type):
-    _instances = {}
-
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(
-                Singleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
-
+from bisect import bisect_left, bisect_right
 
 INT_SIZE = 4
 
@@ -56,14 +48,11 @@ class Symbol(object):
         self.type = symbol_type
 
 
-class SymbolTable(object, metaclass=Singleton):
+class SymbolTable(object):
     def __init__(self, base_addr=500, temp_address_base=1000):
-        self._symbols = {}
-        self._var_count = 0
-        self._scope_stack = []
         self._base_addr = base_addr
         self._temp_base_addr = temp_address_base
-        self._temp_var_count = 0
+        self.clear()
 
     def __str__(self):
         header = 'Symbol table contents'
@@ -77,7 +66,21 @@ class SymbolTable(object, metaclass=Singleton):
 
     __repr__ = __str__
 
-    clear = __init__
+    def clear(self):
+        self._symbols = {}
+        self._scope_stack = []
+        # End of the data handed out and of the temporaries, the temporaries
+        # always continue after the data so the two never overlap
+        self._data_end = self._base_addr
+        self._temp_end = self._temp_base_addr
+        # Every temporary address handed out, in increasing order
+        self._temporaries = []
+        self._temporary_set = set()
+        # The first symbol inserted at every address
+        self._addresses = {}
+        # Start addresses of the arrays, sorted, and the arrays at them
+        self._array_starts = []
+        self._arrays = []
 
     def insert(self, new_symbol):
         symbol = new_symbol
@@ -85,27 +88,90 @@ class SymbolTable(object, metaclass=Singleton):
         if lookup_symbol is not None:
             symbol = lookup_symbol
         if symbol.address == None:
-            symbol.set_address(self.get_address(symbol.size))
+            self.set_address(symbol, self.get_address(symbol.size))
+        else:
+            self._addresses.setdefault(symbol.address, symbol)
         self._symbols[symbol.name] = symbol
 
+    def set_address(self, symbol, address):
+        """Moves symbol to address, use this instead of Symbol.set_address."""
+        if symbol.get_address() is not None:
+            if self._addresses.get(symbol.get_address()) is symbol:
+                del self._addresses[symbol.get_address()]
+            self._remove_array(symbol)
+        symbol.set_address(address)
+        self._addresses.setdefault(address, symbol)
+        if symbol.get_size() > INT_SIZE:
+            self._add_array(symbol)
+
+    def _add_array(self, symbol):
+        index = bisect_right(self._array_starts, symbol.get_address())
+        self._array_starts.insert(index, symbol.get_address())
+        self._arrays.insert(index, symbol)
+
+    def _remove_array(self, symbol):
+        index = bisect_left(self._array_starts, symbol.get_address())
+        while index < len(self._arrays) and self._array_starts[index] == symbol.get_address():
+            if self._arrays[index] is symbol:
+                del self._array_starts[index]
+                del self._arrays[index]
+                return
+            index += 1
+
     def lookup(self, name):
         return self._symbols.get(name, None)
 
     def lookup_with_address(self, address):
-        for (x, y) in self._symbols.items():
-            if y.get_address() == address:
-              return y
+        """Finds the symbol at address, or the array address is an element of."""
+        symbol = self._addresses.get(address)
+        if symbol is not None:
+            return symbol
+        index = bisect_right(self._array_starts, address) - 1
+        if index >= 0 and address < self._array_starts[index] + self._arrays[index].get_size():
+            return self._arrays[index]
+        return None
+
+    def _reserve(self, size):
+        """Start of size bytes of data, placed after the temporaries if they would overlap them."""
+        address = self._data_end
+        if self._temporaries and address < self._temp_end and address + size > self._temp_base_addr:
+            address = self._temp_end
+        self._data_end = address + size
+        self._temp_end = max(self._temp_end, self._data_end)
+        return address
 
     def get_address(self, size):
-        address = self._base_addr + self._var_count * size
-        self._var_count += 1
-        return address
+        return self._reserve(size)
+
+    def allocate_array(self, symbol, length):
+        """
+        Gives symbol length contiguous cells, in place when it holds the last
+        address handed out and the cells after it are free, otherwise in a
+        new block.
+        """
+        length = max(length, 1)
+        if symbol.get_address() is not None and symbol.get_address() + INT_SIZE == self._data_end:
+            if self._temp_end == self._data_end:
+                # No temporary was handed out after symbol
+                self._temp_end = max(symbol.get_address(), self._temp_base_addr)
+            self._data_end = symbol.get_address()
+        address = self._reserve(length * INT_SIZE)
+        symbol.set_size(length * INT_SIZE)
+        self.set_address(symbol, address)
 
     def get_temporary_address(self, size=1):
-        address = self._temp_base_addr + self._temp_var_count * INT_SIZE
-        self._temp_var_count += 1
+        address = self._temp_end
+        self._temp_end += INT_SIZE
+        self._temporaries.append(address)
+        self._temporary_set.add(address)
         return address
 
+    def get_temporaries(self):
+        return self._temporaries
+
+    def is_temporary(self, address):
+        return address in self._temporary_set
+
     def find_address(self, input):
         symbol = self.lookup(input)
         return symbol.get_address()
@@ -1,4 +1,5 @@
 import sys
+from array import array
 from enum import Enum, unique
 
 OPERATORS = [
@@ -46,8 +47,17 @@ class TokenType(Enum):
     def __eq__(self, other):
       return self.value == other.value
 
+    def __hash__(self):
+      # _value_ skips the descriptor behind value, token types key hot dicts
+      return hash(self._value_)
+
+
+TOKEN_TYPES = tuple(TokenType)
+TOKEN_TYPE_CODES = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+
 
 class Token(object):
+    __slots__ = ('_row', '_column', '_type', '_lexeme')
 
     def __init__(self, row, column, token_type, lexeme):
         if not isinstance(token_type, TokenType):
@@ -91,3 +101,53 @@ class Token(object):
     def set_lexeme(self, lexeme):
         self._lexeme = lexeme
         return self
+
+
+class TokenBlock(object):
+    """
+    A fixed-size run of tokens stored column-wise in parallel arrays.
+    Lexemes are kept as [start, end) offsets into the scanned input and are
+    only decoded on request, so consumers that look at types, rows or
+    columns never allocate per-token objects. Scanner.token_blocks() fills
+    the arrays directly and only decodes the lexemes of IDs, for the symbol
+    table, and the ones written to tokens.txt.
+    """
+    __slots__ = ('_content', 'types', 'starts', 'ends', 'rows', 'columns')
+
+    def __init__(self, content):
+        self._content = content
+        self.types = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.rows = array('q')
+        self.columns = array('q')
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        return (self.get_token(index) for index in range(len(self.types)))
+
+    def append(self, token_type, start, end, row, column):
+        self.types.append(TOKEN_TYPE_CODES[token_type])
+        self.starts.append(start)
+        self.ends.append(end)
+        self.rows.append(row)
+        self.columns.append(column)
+
+    def get_type(self, index):
+        return TOKEN_TYPES[self.types[index]]
+
+    def get_lexeme(self, index):
+        token_type = TOKEN_TYPES[self.types[index]]
+        if token_type is TokenType.EOF:
+            return TokenType.EOF.value
+        start = self.starts[index]
+        end = self.ends[index]
+        # The scanner turns any operator followed by '=' into '=='
+        if token_type is TokenType.SYMBOL and end - start == 2:
+            return '=='
+        return str(self._content[start:end], 'latin-1')
+
+    def get_token(self, index):
+        return Token(self.rows[index], self.columns[index], self.get_type(index), self.get_lexeme(index))
@@ -0,0 +1,240 @@
+import heapq
+import time
+try:
+    import numpy
+except ImportError:
+    numpy = None
+from .vm import (VirtualMachine, VMError, CHECK_INTERVAL, INT_MIN, INT_MAX, OP_ASSIGN, OP_ADD,
+                 OP_JPF, OP_JP, OP_LT, OP_EQ, OP_MULT, OP_SUB, OP_PRINT, OP_GENERIC)
+from .ir import IMMEDIATE, INDIRECT
+from .symbol import INT_SIZE
+
+# Instance states
+RUNNING = 0
+HALTED = 1
+LIMIT_EXCEEDED = 2
+FAILED = 3
+
+
+class VectorVirtualMachine(VirtualMachine):
+    """
+    Runs one program over many initial memories at once with NumPy.
+    Memory is a 2-D array (instances x cells) and every instance has its
+    own pc. Instances are grouped by pc and the group with the lowest pc
+    runs next, executing its instruction as a single array operation over
+    the group. JPF splits a group by a mask and groups that arrive at the
+    same pc are merged again, so diverged instances reconverge after an
+    if or a loop.
+
+    Overflow, invalid indirect addresses and MAX_INSTRUCTIONS only stop the
+    instances they happen in, see get_statuses().
+    """
+
+    def __init__(self, program, **kwargs):
+        if numpy is None:
+            raise VMError("VectorVirtualMachine requires numpy")
+        super().__init__(program, **kwargs)
+        self._statuses = None
+        self._counts = None
+        self._errors = None
+
+    def __repr__(self):
+        return "VectorVirtualMachine(%d instructions)" % len(self._program)
+
+    def _new_vector_memory(self, initial):
+        if isinstance(initial, int):
+            initial = [None] * initial
+        if isinstance(initial, dict):
+            columns = dict((address, numpy.asarray(values, dtype=numpy.int64))
+                           for address, values in initial.items())
+            instances = max([len(values) for values in columns.values()] + [0])
+        else:
+            columns = None
+            instances = len(initial)
+        # Column major so every cell is contiguous across the instances
+        memory = numpy.zeros(
+            (instances, self._data_cells + len(self._constants)), dtype=numpy.int64, order='F')
+        memory[:, self._data_cells:] = self._constants
+        if columns is not None:
+            for address, values in columns.items():
+                memory[:, self._initial_cell(address)] = values
+        else:
+            for instance, values in enumerate(initial):
+                for address, value in (values or {}).items():
+                    memory[instance, self._initial_cell(address)] = value
+        if memory[:, :self._data_cells].size and (
+                memory[:, :self._data_cells].min() < INT_MIN or memory[:, :self._data_cells].max() > INT_MAX):
+            raise VMError("Initial memory does not fit in 32 bits")
+        return memory
+
+    def run(self, initial=1):
+        """
+        Runs the program once per instance. initial is the number of
+        instances, a list with a dict of initial values per instance or a
+        dict mapping addresses to a sequence of values. Returns the values
+        printed by every instance.
+        """
+        memory = self._memory = self._new_vector_memory(initial)
+        instances = memory.shape[0]
+        halt = len(self._code) - 1
+        statuses = self._statuses = numpy.zeros(instances, dtype=numpy.int8)
+        counts = self._counts = numpy.zeros(instances, dtype=numpy.int64)
+        self._errors = {}
+        everyone = numpy.arange(instances)
+        prints = []
+        limit = self.MAX_INSTRUCTIONS
+        deadline = self._get_deadline()
+        # Instances waiting at each pc, the lowest pc always runs next
+        groups = {0: [everyone]} if instances else {}
+        pending = list(groups)
+        steps = 0
+        while pending:
+            pc = heapq.heappop(pending)
+            parts = groups.pop(pc)
+            rows = parts[0] if len(parts) == 1 else numpy.concatenate(parts)
+            if pc == halt:
+                statuses[rows] = HALTED
+                continue
+            executed = counts[rows]
+            if limit is not None:
+                over = executed >= limit
+                if over.any():
+                    statuses[rows[over]] = LIMIT_EXCEEDED
+                    rows, executed = rows[~over], executed[~over]
+                    if not len(rows):
+                        continue
+            counts[rows] = executed + 1
+            if len(rows) == instances:
+                rows, index = everyone, slice(None)
+            else:
+                index = rows
+            for target, moved in self._step(memory, rows, index, pc, prints):
+                if not len(moved):
+                    continue
+                if target in groups:
+                    groups[target].append(moved)
+                else:
+                    groups[target] = [moved]
+                    heapq.heappush(pending, target)
+            steps += 1
+            if steps % CHECK_INTERVAL == 0 and deadline is not None and time.perf_counter() > deadline:
+                for parts in groups.values():
+                    for rows in parts:
+                        statuses[rows] = LIMIT_EXCEEDED
+                break
+        # Instances that failed did not execute the failing instruction
+        counts[statuses == FAILED] -= 1
+        outputs = [[] for _ in range(instances)]
+        for rows, values in prints:
+            for instance, value in zip(rows.tolist(), values.tolist()):
+                outputs[instance].append(value)
+        self._output = outputs
+        return outputs
+
+    def _fail(self, rows, bad, pc, message):
+        failed = rows[bad]
+        self._statuses[failed] = FAILED
+        for instance in failed.tolist():
+            self._errors[instance] = "%s on line %d" % (message, pc)
+
+    def _store(self, m, rows, index, cells, values, pc):
+        """Writes values that fit in 32 bits, stops the other instances."""
+        bad = (values < INT_MIN) | (values > INT_MAX)
+        if bad.any():
+            self._fail(rows, bad, pc, "Integer overflow")
+            rows = rows[~bad]
+            values = values[~bad]
+            if not isinstance(cells, int):
+                cells = cells[~bad]
+            index = rows
+        m[index, cells] = values
+        return rows
+
+    def _step(self, m, rows, index, pc, prints):
+        """Executes line pc for rows, returns (pc, rows) pairs to continue with."""
+        op, a, b, r = self._code[pc]
+        if op == OP_GENERIC:
+            return self._step_generic(m, rows, pc, prints)
+        if op == OP_ASSIGN:
+            m[index, b] = m[index, a]
+        elif op == OP_ADD:
+            rows = self._store(m, rows, index, r, m[index, a] + m[index, b], pc)
+        elif op == OP_SUB:
+            rows = self._store(m, rows, index, r, m[index, a] - m[index, b], pc)
+        elif op == OP_MULT:
+            rows = self._store(m, rows, index, r, m[index, a] * m[index, b], pc)
+        elif op == OP_LT:
+            m[index, r] = m[index, a] < m[index, b]
+        elif op == OP_EQ:
+            m[index, r] = m[index, a] == m[index, b]
+        elif op == OP_JPF:
+            taken = m[index, a] != 0
+            return ((pc + 1, rows[taken]), (b, rows[~taken]))
+        elif op == OP_JP:
+            return ((a, rows),)
+        elif op == OP_PRINT:
+            prints.append((rows, m[index, a].copy()))
+        return ((pc + 1, rows),)
+
+    def _cells(self, m, rows, operand):
+        """Cell of operand for every row and a mask of rows with an invalid address."""
+        if operand.kind == INDIRECT:
+            addresses = m[rows, operand.value // INT_SIZE]
+            bad = (addresses % INT_SIZE != 0) | (addresses < 0) | (
+                addresses >= self._data_cells * INT_SIZE)
+            return addresses // INT_SIZE, bad
+        if operand.kind == IMMEDIATE:
+            cell = self._constant_cells[operand.value]
+        else:
+            cell = operand.value // INT_SIZE
+        return numpy.full(len(rows), cell, dtype=numpy.int64), numpy.zeros(len(rows), dtype=bool)
+
+    def _step_generic(self, m, rows, pc, prints):
+        """Instructions with indirect operands gather and scatter per row."""
+        operation, operands = self._generic[self._code[pc][1]]
+        label = self._code[pc][2]
+        if operation == OP_JP:
+            return ((label, rows),)
+        cells = [self._cells(m, rows, operand) for operand in operands if operand is not None]
+        bad = numpy.zeros(len(rows), dtype=bool)
+        for _cell, invalid in cells:
+            bad |= invalid
+        if bad.any():
+            self._fail(rows, bad, pc, "Invalid indirect address")
+            rows = rows[~bad]
+            cells = [(cell[~bad], invalid[~bad]) for cell, invalid in cells]
+        x = m[rows, cells[0][0]]
+        if operation == OP_JPF:
+            taken = x != 0
+            return ((pc + 1, rows[taken]), (label, rows[~taken]))
+        if operation == OP_PRINT:
+            prints.append((rows, x))
+        elif operation == OP_ASSIGN:
+            m[rows, cells[1][0]] = x
+        else:
+            y = m[rows, cells[1][0]]
+            target = cells[2][0]
+            if operation == OP_LT:
+                m[rows, target] = x < y
+            elif operation == OP_EQ:
+                m[rows, target] = x == y
+            elif operation == OP_ADD:
+                rows = self._store(m, rows, rows, target, x + y, pc)
+            elif operation == OP_SUB:
+                rows = self._store(m, rows, rows, target, x - y, pc)
+            else:
+                rows = self._store(m, rows, rows, target, x * y, pc)
+        return ((pc + 1, rows),)
+
+    # For testing purposes
+    def get_statuses(self):
+        return self._statuses
+
+    def get_errors(self):
+        return self._errors
+
+    def get_instruction_counts(self):
+        return self._counts
+
+    def get_memory_values(self, address):
+        return self._memory[:, address // INT_SIZE]
@@ -0,0 +1,596 @@
+import sys
+import re
+import time
+from array import array
+from functools import lru_cache
+from .ir import parse_program, DIRECT, IMMEDIATE, INDIRECT, LABEL
+from .symbol import INT_SIZE
+
+# Pre-decoded operation codes, in the order the dispatch loop tests them
+OP_ASSIGN = 0
+OP_ADD = 1
+OP_JPF = 2
+OP_JP = 3
+OP_LT = 4
+OP_EQ = 5
+OP_MULT = 6
+OP_SUB = 7
+OP_PRINT = 8
+OP_NOP = 9
+OP_GENERIC = 10
+OP_HALT = 11
+
+OPERATIONS = {
+    'ASSIGN': OP_ASSIGN,
+    'ADD': OP_ADD,
+    'JPF': OP_JPF,
+    'JP': OP_JP,
+    'LT': OP_LT,
+    'EQ': OP_EQ,
+    'MULT': OP_MULT,
+    'SUB': OP_SUB,
+    'PRINT': OP_PRINT
+}
+
+# Operand positions read and written by each operation
+_SOURCES = {
+    OP_ASSIGN: (0,), OP_ADD: (0, 1), OP_JPF: (0,), OP_JP: (), OP_LT: (0, 1),
+    OP_EQ: (0, 1), OP_MULT: (0, 1), OP_SUB: (0, 1), OP_PRINT: (0,)
+}
+_TARGETS = {OP_ASSIGN: 1, OP_ADD: 2, OP_LT: 2, OP_EQ: 2, OP_MULT: 2, OP_SUB: 2}
+_LABELS = {OP_JPF: 1, OP_JP: 0}
+
+CHECK_INTERVAL = 1 << 16
+
+# Range of a memory cell
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+MODES = ('interpreter', 'closure', 'python')
+
+# Largest block, in instructions, copied into the blocks jumping to it
+BLOCK_INLINE_LIMIT = 16
+
+
+class VMError(Exception):
+    pass
+
+
+class ExecutionLimitExceeded(VMError):
+    pass
+
+
+def _overflow(value):
+    raise OverflowError("signed integer is %s" % (
+        "greater than maximum" if value > 0 else "less than minimum"))
+
+
+@lru_cache(maxsize=64)
+def _compile_python(source):
+    """Code objects of translated programs, shared by every VirtualMachine."""
+    return compile(source, '<three-address code>', 'exec')
+
+
+class VirtualMachine(object):
+    """
+    Executes the three-address code emitted by SemanticAnalyzer.
+    Memory is a flat array('i') indexed by address / 4, immediates live in
+    a constant pool of extra cells after the data cells, and every
+    instruction is decoded once into an (operation, a, b, r) tuple of cell
+    indexes and line numbers.
+
+    MODE 'interpreter' dispatches on the decoded tuples one by one, MODE
+    'closure' compiles every basic block into a Python function first and
+    MODE 'python' translates the whole program into a single function.
+    After an error memory holds the state at the failing instruction in
+    every mode. The closure and python modes check the limits before a
+    block instead of every instruction, so after ExecutionLimitExceeded
+    they hold the state at the start of the block that reached the limit.
+    """
+
+    def __init__(self, program, **kwargs):
+        if isinstance(program, str):
+            program = parse_program(program)
+        self._program = list(program)
+        self.MAX_INSTRUCTIONS = kwargs.get('MAX_INSTRUCTIONS', 10 ** 8)
+        self.TIME_LIMIT = kwargs.get('TIME_LIMIT', None)
+        self.MEMORY_SIZE = kwargs.get('MEMORY_SIZE', 0)
+        self.MODE = kwargs.get('MODE', 'interpreter')
+        runners = {
+            'interpreter': self._run_interpreter,
+            'closure': self._run_closure,
+            'python': self._run_python
+        }
+        if self.MODE not in runners:
+            raise VMError("Invalid mode %s" % self.MODE)
+        self._runner = runners[self.MODE]
+        self._blocks = None
+        self._python_function = None
+        self._output = []
+        self._memory = None
+        self._instruction_count = 0
+        self._decode()
+
+    def __repr__(self):
+        return "VirtualMachine(%d instructions)" % len(self._program)
+
+    # Decoding
+
+    def _decode(self):
+        addresses = [0]
+        for instruction in self._program:
+            for operand in instruction.get_operands():
+                if operand is not None and operand.kind in (DIRECT, INDIRECT):
+                    if operand.value % INT_SIZE != 0 or operand.value < 0:
+                        raise VMError("Unaligned address %d on line %d" %
+                                      (operand.value, instruction.get_line()))
+                    addresses.append(operand.value)
+        self._data_cells = max(max(addresses) // INT_SIZE + 1, self.MEMORY_SIZE)
+        self._constants = []
+        self._constant_cells = {}
+        self._generic = []
+        length = max([instruction.get_line() for instruction in self._program] + [-1]) + 1
+        # Missing lines are reserved slots that were never filled
+        code = [(OP_NOP, 0, 0, 0)] * length
+        for instruction in self._program:
+            code[instruction.get_line()] = self._decode_instruction(instruction, length)
+        code.append((OP_HALT, 0, 0, 0))
+        self._code = code
+
+    def _decode_instruction(self, instruction, length):
+        operation = OPERATIONS.get(instruction.get_operation())
+        if operation is None:
+            raise VMError("Unknown operation %s on line %d" %
+                          (instruction.get_operation(), instruction.get_line()))
+        operands = instruction.get_operands()
+        fields = [0, 0, 0]
+        for position in _SOURCES[operation]:
+            fields[position] = self._decode_operand(instruction, position, False)
+        if operation in _TARGETS:
+            position = _TARGETS[operation]
+            fields[position] = self._decode_operand(instruction, position, True)
+        if operation in _LABELS:
+            position = _LABELS[operation]
+            operand = operands[position]
+            if operand is None or operand.kind != LABEL:
+                raise VMError("Missing jump target on line %d" % instruction.get_line())
+            # Jumps past the last line halt
+            fields[position] = min(operand.value, length)
+        if any(operand is not None and operand.kind == INDIRECT for operand in operands):
+            self._generic.append((operation, operands))
+            return (OP_GENERIC, len(self._generic) - 1, fields[_LABELS.get(operation, 0)], 0)
+        return (operation, fields[0], fields[1], fields[2])
+
+    def _decode_operand(self, instruction, position, target):
+        operand = instruction.get_operands()[position]
+        if operand is None or operand.kind == LABEL or target and operand.kind == IMMEDIATE:
+            raise VMError("Invalid operand %d on line %d" % (position, instruction.get_line()))
+        if operand.kind == IMMEDIATE:
+            if not INT_MIN <= operand.value <= INT_MAX:
+                raise VMError("Immediate %d out of range on line %d" %
+                              (operand.value, instruction.get_line()))
+            return self._constant_cell(operand.value)
+        return operand.value // INT_SIZE
+
+    def _constant_cell(self, value):
+        cell = self._constant_cells.get(value)
+        if cell is None:
+            cell = self._data_cells + len(self._constants)
+            self._constant_cells[value] = cell
+            self._constants.append(value)
+        return cell
+
+    def _indirect_cell(self, address):
+        if address % INT_SIZE != 0 or not 0 <= address < self._data_cells * INT_SIZE:
+            raise VMError("Invalid indirect address %d" % address)
+        return address // INT_SIZE
+
+    def _initial_cell(self, address):
+        """Cell of an initial value, only the data cells of the program can be set."""
+        if not isinstance(address, int) or address % INT_SIZE != 0 or (
+                not 0 <= address < self._data_cells * INT_SIZE):
+            raise VMError("Invalid initial address %s" % (address,))
+        return address // INT_SIZE
+
+    def _cell(self, memory, operand):
+        if operand.kind == INDIRECT:
+            return self._indirect_cell(memory[operand.value // INT_SIZE])
+        if operand.kind == IMMEDIATE:
+            return self._constant_cells[operand.value]
+        return operand.value // INT_SIZE
+
+    def _execute_generic(self, memory, pc, index):
+        """Slow path for instructions with indirect operands."""
+        operation, operands = self._generic[index]
+        if operation == OP_JP:
+            return self._code[pc][2]
+        a = memory[self._cell(memory, operands[0])]
+        if operation == OP_JPF:
+            return self._code[pc][2] if not a else pc + 1
+        if operation == OP_PRINT:
+            self._output.append(a)
+            return pc + 1
+        if operation == OP_ASSIGN:
+            memory[self._cell(memory, operands[1])] = a
+            return pc + 1
+        b = memory[self._cell(memory, operands[1])]
+        if operation == OP_ADD:
+            value = a + b
+        elif operation == OP_SUB:
+            value = a - b
+        elif operation == OP_MULT:
+            value = a * b
+        elif operation == OP_LT:
+            value = 1 if a < b else 0
+        else:
+            value = 1 if a == b else 0
+        memory[self._cell(memory, operands[2])] = value
+        return pc + 1
+
+    # Execution
+
+    def _new_memory(self, initial=None):
+        memory = array('i', bytes(self._data_cells * INT_SIZE))
+        memory.extend(self._constants)
+        if initial:
+            for address, value in initial.items():
+                if not INT_MIN <= value <= INT_MAX:
+                    raise VMError("Initial value %d at %d does not fit in 32 bits" % (value, address))
+                memory[self._initial_cell(address)] = value
+        return memory
+
+    def run(self, initial=None):
+        """
+        Runs the program from line 0 on fresh memory, initial maps addresses
+        to starting values. Addresses past the highest one the program uses
+        need a MEMORY_SIZE, in cells, that covers them. Returns the values
+        printed by PRINT.
+        """
+        self._output = []
+        self._instruction_count = 0
+        self._memory = memory = self._new_memory(initial)
+        self._runner(memory)
+        return self._output
+
+    def _get_deadline(self):
+        if self.TIME_LIMIT is None:
+            return None
+        return time.perf_counter() + self.TIME_LIMIT
+
+    def _check_limits(self, executed, deadline):
+        if self.MAX_INSTRUCTIONS is not None and executed > self.MAX_INSTRUCTIONS:
+            raise ExecutionLimitExceeded(
+                "More than %d instructions executed" % self.MAX_INSTRUCTIONS)
+        if deadline is not None and time.perf_counter() > deadline:
+            raise ExecutionLimitExceeded(
+                "Time limit of %s seconds exceeded" % self.TIME_LIMIT)
+
+    # Interpreter mode
+
+    def _run_interpreter(self, memory):
+        remaining = self.MAX_INSTRUCTIONS
+        deadline = self._get_deadline()
+        pc = 0
+        while True:
+            budget = CHECK_INTERVAL if remaining is None else min(
+                CHECK_INTERVAL, remaining + 1)
+            pc, executed, halted = self._execute(memory, pc, budget)
+            self._instruction_count += executed
+            if halted:
+                return
+            if remaining is not None:
+                remaining -= executed
+            self._check_limits(self._instruction_count, deadline)
+
+    def _execute(self, m, pc, budget):
+        """Runs at most budget instructions, returns (pc, executed, halted)."""
+        code = self._code
+        output = self._output
+        count = 0
+        try:
+            for count in range(budget):
+                op, a, b, r = code[pc]
+                if op == OP_ASSIGN:
+                    m[b] = m[a]
+                    pc += 1
+                elif op == OP_ADD:
+                    m[r] = m[a] + m[b]
+                    pc += 1
+                elif op == OP_JPF:
+                    pc = pc + 1 if m[a] else b
+                elif op == OP_JP:
+                    pc = a
+                elif op == OP_LT:
+                    m[r] = m[a] < m[b]
+                    pc += 1
+                elif op == OP_EQ:
+                    m[r] = m[a] == m[b]
+                    pc += 1
+                elif op == OP_MULT:
+                    m[r] = m[a] * m[b]
+                    pc += 1
+                elif op == OP_SUB:
+                    m[r] = m[a] - m[b]
+                    pc += 1
+                elif op == OP_PRINT:
+                    output.append(m[a])
+                    pc += 1
+                elif op == OP_NOP:
+                    pc += 1
+                elif op == OP_GENERIC:
+                    pc = self._execute_generic(m, pc, a)
+                else:
+                    return pc, count, True
+        except (OverflowError, IndexError) as error:
+            raise VMError("%s on line %d" % (error, pc))
+        return pc, budget, False
+
+    # Basic blocks, shared by the closure and python modes
+
+    def _get_blocks(self):
+        """Splits the decoded code into basic blocks, as (start, end) pairs."""
+        code = self._code
+        halt = len(code) - 1
+        leaders = {0, halt}
+        for pc, (op, a, b, _r) in enumerate(code):
+            if op == OP_GENERIC:
+                op = self._generic[a][0]
+                a = b
+            if op == OP_JP:
+                leaders.update((a, pc + 1))
+            elif op == OP_JPF:
+                leaders.update((b, pc + 1))
+        leaders = sorted(leaders)
+        return list(zip(leaders, leaders[1:]))
+
+    def _expression(self, cell, cells):
+        if cell >= self._data_cells:
+            return repr(self._constants[cell - self._data_cells])
+        return cells % cell
+
+    def _operand_expression(self, operand):
+        if operand.kind == INDIRECT:
+            return "m[cell(m[%d])]" % (operand.value // INT_SIZE)
+        if operand.kind == IMMEDIATE:
+            return repr(operand.value)
+        return "m[%d]" % (operand.value // INT_SIZE)
+
+    def _block_statements(self, start, end, block_index, cells):
+        """
+        Returns the statements of a block and its exit, either (block,) or
+        (block if true, condition, block if false). With cells other than
+        m[%d] the cells are Python ints, so comparisons are converted and
+        arithmetic is range checked like a store into the array would be.
+        """
+        local = cells != "m[%d]"
+        lines = []
+        exit = (block_index[end],)
+        for pc in range(start, end):
+            op, a, b, r = self._code[pc]
+            if op == OP_GENERIC:
+                op, operands = self._generic[a]
+                label = b
+                x, y, z = [operand and self._operand_expression(operand)
+                           for operand in operands]
+            else:
+                label = a if op == OP_JP else b
+                x, y, z = [self._expression(cell, cells) for cell in (a, b, r)]
+            if op == OP_ASSIGN:
+                lines.append("%s = %s" % (y, x))
+            elif op in (OP_ADD, OP_SUB, OP_MULT):
+                value = "%s %s %s" % (x, {OP_ADD: '+', OP_SUB: '-', OP_MULT: '*'}[op], y)
+                if local:
+                    # The cell keeps its value when the result does not fit
+                    lines.append("t = %s" % value)
+                    lines.append("if not -2147483648 <= t <= 2147483647: overflow(t)")
+                    value = "t"
+                lines.append("%s = %s" % (z, value))
+            elif op in (OP_LT, OP_EQ):
+                comparison = "%s %s %s" % (x, '<' if op == OP_LT else '==', y)
+                if local:
+                    comparison = "1 if %s else 0" % comparison
+                lines.append("%s = %s" % (z, comparison))
+            elif op == OP_PRINT:
+                lines.append("out.append(%s)" % x)
+            elif op == OP_JP:
+                exit = (block_index[label],)
+            elif op == OP_JPF:
+                exit = (block_index[end], x, block_index[label])
+        return lines, exit
+
+    def _block_bodies(self, cells):
+        """
+        Returns (statements, exit, size) for every basic block and the index
+        of the halting block. A block that always continues into another
+        block of at most BLOCK_INLINE_LIMIT instructions also runs that
+        block, so the condition of a while loop ends its body.
+        """
+        blocks = self._get_blocks()
+        halt = len(blocks)
+        block_index = dict((start, index)
+                           for index, (start, _end) in enumerate(blocks))
+        block_index[len(self._code) - 1] = halt
+        bodies = [self._block_statements(start, end, block_index, cells)
+                  for start, end in blocks]
+        block_sizes = [end - start for start, end in blocks]
+        result = []
+        for index, (lines, exit) in enumerate(bodies):
+            size = block_sizes[index]
+            if len(exit) == 1 and exit[0] not in (index, halt) and block_sizes[exit[0]] <= BLOCK_INLINE_LIMIT:
+                successor = exit[0]
+                lines = lines + bodies[successor][0]
+                exit = bodies[successor][1]
+                size += block_sizes[successor]
+            result.append((lines, exit, size))
+        return result, halt
+
+    def _limit_checker(self, deadline):
+        """Returns the instruction count at which check has to be called next, and check."""
+        limit = self.MAX_INSTRUCTIONS
+
+        def check(executed):
+            self._instruction_count = executed
+            self._check_limits(executed, deadline)
+            next_check = executed + CHECK_INTERVAL
+            return next_check if limit is None else min(next_check, limit + 1)
+        return check(0), check
+
+    # Closure mode
+
+    def _compile_blocks(self):
+        """
+        Compiles every basic block into a function of (memory, output) that
+        runs the block with its operands resolved to array indexes and
+        constants, and returns the index of the next block.
+        """
+        bodies, halt = self._block_bodies("m[%d]")
+        sources = []
+        for index, (lines, exit, _size) in enumerate(bodies):
+            if len(exit) == 1:
+                result = "%d" % exit
+            else:
+                result = "%d if %s else %d" % exit
+            sources.append("def block_%d(m, out):\n%s    return %s" % (
+                index, ''.join("    %s\n" % line for line in lines), result))
+        namespace = {'cell': self._indirect_cell}
+        exec(compile("\n\n".join(sources), '<three-address code>', 'exec'), namespace)
+        functions = [namespace['block_%d' % index] for index in range(halt)]
+        return functions, [size for _lines, _exit, size in bodies], halt
+
+    def _run_closure(self, memory):
+        if self._blocks is None:
+            self._blocks = self._compile_blocks()
+        functions, sizes, halt = self._blocks
+        output = self._output
+        next_check, check = self._limit_checker(self._get_deadline())
+        executed = 0
+        index = 0
+        try:
+            while index != halt:
+                executed += sizes[index]
+                if executed >= next_check:
+                    next_check = check(executed)
+                index = functions[index](memory, output)
+        except (OverflowError, IndexError) as error:
+            self._block_error(error, index)
+        self._instruction_count = executed
+
+    def _block_error(self, error, index):
+        raise VMError("%s in the block starting on line %d" % (
+            error, self._get_blocks()[index][0]))
+
+    # Python mode
+
+    def get_python_source(self):
+        """
+        Translates the whole program into one Python function. Memory cells
+        live in local variables unless indirect operands need the array,
+        blocks are selected by a binary dispatch on the block index, and a
+        block that branches back to itself becomes a native while loop. The
+        local cells are written back to memory however the function exits.
+        """
+        cells = "m[%d]" if self._generic else "v%d"
+        bodies, halt = self._block_bodies(cells)
+        used = sorted(set(int(cell) for lines, exit, _size in bodies
+                          for cell in re.findall(r'\bv(\d+)', ' '.join(lines + [str(exit)]))))
+        source = ["def program(m, out, check, limit):"]
+        source.extend("    v%d = m[%d]" % (cell, cell) for cell in used)
+        source.append("    n = 0")
+        source.append("    b = 0")
+        source.append("    try:")
+        source.append("        while True:")
+
+        def leaf(index, indent):
+            pad = ' ' * indent
+            if index == halt:
+                return [pad + "return n"]
+            lines, exit, size = bodies[index]
+            body = ["n += %d" % size, "if n >= limit:", "    limit = check(n)"] + lines
+            if len(exit) == 3 and index in (exit[0], exit[2]):
+                if exit[0] == index:
+                    test, other = "not (%s)" % exit[1], exit[2]
+                else:
+                    test, other = exit[1], exit[0]
+                return ["%swhile True:" % pad] + ["%s    %s" % (pad, line) for line in body] + [
+                    "%s    if %s:" % (pad, test), "%s        break" % pad, "%sb = %d" % (pad, other)]
+            if len(exit) == 1:
+                body.append("b = %d" % exit)
+            else:
+                body.append("b = %d if %s else %d" % exit)
+            return ["%s%s" % (pad, line) for line in body]
+
+        def dispatch(low, high, indent):
+            if low == high:
+                return leaf(low, indent)
+            middle = (low + high + 1) // 2
+            pad = ' ' * indent
+            return (["%sif b < %d:" % (pad, middle)] + dispatch(low, middle - 1, indent + 4) +
+                    ["%selse:" % pad] + dispatch(middle, high, indent + 4))
+
+        source.extend(dispatch(0, halt, 12))
+        source.append("    except (OverflowError, IndexError) as error:")
+        source.append("        fail(error, b)")
+        source.append("    finally:")
+        source.extend(["        m[%d] = v%d" % (cell, cell) for cell in used] or ["        pass"])
+        return "\n".join(source) + "\n"
+
+    def _run_python(self, memory):
+        if self._python_function is None:
+            namespace = {'cell': self._indirect_cell, 'overflow': _overflow,
+                         'fail': self._block_error}
+            exec(_compile_python(self.get_python_source()), namespace)
+            self._python_function = namespace['program']
+        next_check, check = self._limit_checker(self._get_deadline())
+        self._instruction_count = self._python_function(
+            memory, self._output, check, next_check)
+
+    # For testing purposes
+    def get_output(self):
+        return self._output
+
+    def get_instruction_count(self):
+        return self._instruction_count
+
+    def get_memory_value(self, address):
+        return self._memory[address // INT_SIZE]
+
+
+def benchmark(program, modes=MODES, repeat=3, **kwargs):
+    """
+    Runs program in every mode and returns {mode: (seconds, instructions per
+    second)} using the fastest of repeat runs. Compiling the closures is not
+    timed.
+    """
+    results = {}
+    for mode in modes:
+        vm = VirtualMachine(program, MODE=mode, **kwargs)
+        vm.run()
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            vm.run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[mode] = (best, vm.get_instruction_count() / best if best else 0)
+    return results
+
+
+def main(path):
+    try:
+        with open(path, 'r') as program_file:
+            program = program_file.read()
+    except IOError:
+        print("Error: File not found.")
+        return 1
+    try:
+        for value in VirtualMachine(program).run():
+            print(value)
+    except VMError as error:
+        print("Error: %s" % error)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    status = main(sys.argv[1] if len(sys.argv) > 1 else './output/output.txt')
+    sys.exit(status)
@@ -7,6 +7,14 @@ from compiler.scanner import Scanner
 from compiler.token import Token, TokenType
 from compiler.parser import Parser
 from compiler.semantic_analyzer import SemanticAnalyzer
-from compiler.symbol import SymbolTable
-from compiler.grammar import ActionSymbol
-
+from compiler.symbol import Symbol, SymbolTable
+from compiler.context import CompilationContext
+from compiler.grammar import ActionSymbol, GrammarString
+from compiler.output import OutputSink, DiskOutput, MemoryOutput, NullOutput
+from compiler.compiler import compile_program
+from compiler.ir import Instruction, Operand, parse_program, format_program, DIRECT, IMMEDIATE, INDIRECT, LABEL
+from compiler.vm import VirtualMachine, VMError, ExecutionLimitExceeded, MODES, benchmark
+from compiler.vector_vm import VectorVirtualMachine, numpy, HALTED, LIMIT_EXCEEDED, FAILED
+from compiler.optimizer import optimize, fold_constants, eliminate_dead_code, peephole, allocate_temporaries, renumber
+from compiler.ll1 import ParseTable, GrammarError, get_parse_table, load_parse_table, TABLE_VERSION, GRAMMAR_FILE, benchmark_cold_start
+from compiler.parse_tree import CompactParseTree, ParseTreeView, ParseTreeWriter
@@ -0,0 +1,79 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import main, TestCase
+from context import compile_program, CompilationContext, DiskOutput, MemoryOutput, NullOutput
+
+
+class TestCompiler(TestCase):
+
+    valid_input = (
+        b"void main(void){\n"
+        b"int a;\n"
+        b"a = a + 2;@\n"
+        b"output(a);\n"
+        b"}\n"
+    )
+
+    def artifacts(self, result):
+        return [result.get_tokens(), result.get_lexical_errors(), result.get_parse_tree(),
+                result.get_syntax_errors(), result.get_output(), result.get_semantic_errors()]
+
+    def test_memory_output(self):
+        result = compile_program(self.valid_input)
+        self.assertIsInstance(result.get_output_backend(), MemoryOutput)
+        self.assertEqual(result.get_lexical_errors(),
+                         "3. (@, LexicalError.INVALID_INPUT) \n")
+        self.assertEqual(result.get_syntax_errors(),
+                         "There is no syntax error.")
+        self.assertEqual(result.get_output(),
+                         "0\t(ASSIGN, #0, 500, )\n1\t(ASSIGN, #0, 504, )\n"
+                         "2\t(ADD, #2, 504, 1000)\n3\t(ASSIGN, 1000, 504, )\n"
+                         "4\t(PRINT, 504, , )\n")
+        self.assertEqual(result.get_parse_tree(),
+                         result.get_parser().get_parse_tree())
+
+    def test_disk_output(self):
+        expected = self.artifacts(compile_program(self.valid_input))
+        with tempfile.TemporaryDirectory() as directory:
+            result = compile_program(
+                self.valid_input, OUTPUT=DiskOutput(directory))
+            self.assertEqual(sorted(os.listdir(directory)), [
+                'lexical_errors.txt', 'output.txt', 'parse_tree.txt',
+                'semantic_error.txt', 'syntax_errors.txt', 'tokens.txt'])
+            self.assertEqual(self.artifacts(result), expected)
+
+    def test_null_output(self):
+        result = compile_program(self.valid_input, OUTPUT=False)
+        self.assertIsInstance(result.get_output_backend(), NullOutput)
+        self.assertEqual(self.artifacts(result), [''] * 6)
+
+    def test_context(self):
+        context = CompilationContext(OUTPUT=MemoryOutput())
+        result = compile_program(self.valid_input, CONTEXT=context)
+        self.assertIs(result.get_context(), context)
+        self.assertEqual(
+            result.get_symbol_table().lookup('a').get_address(), 504)
+        context.clear()
+        self.assertIsNone(context.get_symbol_table().lookup('a'))
+        # Every compilation starts from the base addresses
+        result = compile_program(self.valid_input)
+        self.assertEqual(
+            result.get_symbol_table().lookup('a').get_address(), 504)
+
+    def test_concurrent_compilations(self):
+        programs = [
+            b"void main(void){\nint a;\nint b%d;\nb%d = a + %d;\noutput(b%d);\n}\n"
+            % (i, i, i, i) for i in range(16)
+        ]
+        expected = [self.artifacts(compile_program(program))
+                    for program in programs]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda program: self.artifacts(compile_program(program)),
+                programs * 4))
+        self.assertEqual(results, expected * 4)
+
+
+if __name__ == '__main__':
+    main()
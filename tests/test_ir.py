@@ -0,0 +1,32 @@
+from unittest import main, TestCase
+from context import Instruction, Operand, parse_program, format_program
+from context import DIRECT, IMMEDIATE, INDIRECT, LABEL
+
+
+class TestIR(TestCase):
+
+    program = (
+        "0\t(ASSIGN, #0, 500, )\n"
+        "1\t(LT, 508, @504, 1000)\n"
+        "2\t(JPF, 1000, 5, )\n"
+        "3\t(PRINT, 508, , )\n"
+        "4\t(JP, 1, , )\n"
+    )
+
+    def test_operands(self):
+        instructions = parse_program(self.program)
+        self.assertEqual(instructions[0].get_operands(), [
+                         Operand(IMMEDIATE, 0), Operand(DIRECT, 500), None])
+        self.assertEqual(instructions[1].get_operands(), [
+                         Operand(DIRECT, 508), Operand(INDIRECT, 504), Operand(DIRECT, 1000)])
+        self.assertEqual(instructions[2].get_operands()[1], Operand(LABEL, 5))
+        self.assertEqual(instructions[4].get_operands()[0], Operand(LABEL, 1))
+
+    def test_format(self):
+        self.assertEqual(format_program(parse_program(self.program)), self.program)
+        self.assertEqual(str(Instruction(7, 'ADD', ['#1', 504, 1000])),
+                         "7\t(ADD, #1, 504, 1000)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+from unittest import main, TestCase
+from context import compile_program, parse_program, format_program, SymbolTable
+from context import VirtualMachine, ExecutionLimitExceeded
+from context import optimize, fold_constants, eliminate_dead_code, peephole, renumber
+from context import allocate_temporaries
+
+
+class TestOptimizer(TestCase):
+
+    valid_input = (
+        b"void main(void){\n"
+        b"int a;\n"
+        b"int b;\n"
+        b"a = 10 * 2 + 3 * (1 < 0);\n"
+        b"b = 4 + 3;\n"
+        b"output(a);\n"
+        b"output(b);\n"
+        b"}\n"
+    )
+
+    def symbol_table(self, temporaries):
+        symbol_table = SymbolTable()
+        for _ in range(temporaries):
+            symbol_table.get_temporary_address()
+        return symbol_table
+
+    def test_fold_constants(self):
+        result = compile_program(self.valid_input, OPTIMIZE=True)
+        self.assertEqual(result.get_output(), (
+            "0\t(ASSIGN, #0, 500, )\n"
+            "1\t(ASSIGN, #0, 504, )\n"
+            "2\t(ASSIGN, #0, 508, )\n"
+            "3\t(ASSIGN, #20, 504, )\n"
+            "4\t(ASSIGN, #7, 508, )\n"
+            "5\t(PRINT, 504, , )\n"
+            "6\t(PRINT, 508, , )\n"
+        ))
+        self.assertEqual(VirtualMachine(result.get_output()).run(),
+                         VirtualMachine(compile_program(self.valid_input).get_output()).run())
+
+    def test_basic_blocks(self):
+        program = parse_program(
+            "0\t(LT, #1, #2, 1000)\n"
+            "1\t(JPF, 1000, 4, )\n"
+            "2\t(ADD, 500, #1, 500)\n"
+            "3\t(MULT, #65536, #65536, 1004)\n"
+            "4\t(ADD, 1000, #1, 1008)\n"
+            "5\t(PRINT, 1008, , )\n"
+        )
+        # 1000 is read after a jump target, the overflow is kept for the VM
+        self.assertEqual(format_program(fold_constants(program, self.symbol_table(3))), (
+            "0\t(ASSIGN, #1, 1000, )\n"
+            "1\t(JPF, #1, 4, )\n"
+            "2\t(ADD, 500, #1, 500)\n"
+            "3\t(MULT, #65536, #65536, 1004)\n"
+            "4\t(ADD, 1000, #1, 1008)\n"
+            "5\t(PRINT, 1008, , )\n"
+        ))
+        # Only temporaries are propagated
+        self.assertEqual(format_program(optimize(program, SymbolTable())[:2]), (
+            "0\t(ASSIGN, #1, 1000, )\n"
+            "1\t(JPF, 1000, 4, )\n"
+        ))
+
+    def test_eliminate_dead_code(self):
+        result = compile_program(
+            b"void main(void){\n"
+            b"int a;\n"
+            b"int b;\n"
+            b"if (1 < 0) {\noutput(a);\n}\nelse {\noutput(b);\n}\n"
+            b"while (0 == 0) {\na = a + 1;\n}\n"
+            b"output(a);\n"
+            b"}\n", OPTIMIZE=True)
+        self.assertEqual(result.get_output(), (
+            "0\t(ASSIGN, #0, 500, )\n"
+            "1\t(ASSIGN, #0, 504, )\n"
+            "2\t(ASSIGN, #0, 508, )\n"
+            "3\t(PRINT, 508, , )\n"
+            "4\t(ADD, #1, 504, 504)\n"
+            "5\t(JP, 4, , )\n"
+        ))
+        vm = VirtualMachine(result.get_output(), MAX_INSTRUCTIONS=1000)
+        with self.assertRaises(ExecutionLimitExceeded):
+            vm.run()
+        self.assertEqual(vm.get_output(), [0])
+
+    def test_dead_temporaries(self):
+        program = parse_program(
+            "0\t(ADD, 500, 504, 1000)\n"
+            "1\t(LT, 1000, #3, 1004)\n"
+            "2\t(EQ, 1004, #1, 1008)\n"
+            "3\t(ASSIGN, 1000, 1012)\n"
+            "4\t(PRINT, 1012, , )\n"
+            "5\t(ASSIGN, #1, 508, )\n"
+        )
+        # The ADD may still overflow
+        self.assertEqual(format_program(eliminate_dead_code(program, self.symbol_table(4))), (
+            "0\t(ADD, 500, 504, 1000)\n"
+            "1\t(ASSIGN, 1000, 1012, )\n"
+            "2\t(PRINT, 1012, , )\n"
+            "3\t(ASSIGN, #1, 508, )\n"
+        ))
+
+    def test_peephole(self):
+        program = parse_program(
+            "0\t(JP, 2, , )\n"
+            "1\t(PRINT, 500, , )\n"
+            "2\t(JP, 4, , )\n"
+            "3\t(JPF, 500, 4, )\n"
+            "4\t(ADD, 500, #0, 1000)\n"
+            "5\t(ASSIGN, 1000, 500, )\n"
+            "6\t(MULT, #1, 504, 1004)\n"
+            "7\t(ASSIGN, 1004, 508, )\n"
+            "8\t(JPF, 508, 0, )\n"
+            "9\t(ADD, 500, 504, 1008)\n"
+            "10\t(ASSIGN, 1008, 500, )\n"
+            "11\t(PRINT, 1008, , )\n"
+        )
+        stats = {}
+        self.assertEqual(format_program(peephole(program, self.symbol_table(3), stats)), (
+            "0\t(ASSIGN, 504, 508, )\n"
+            "1\t(JPF, 508, 0, )\n"
+            "2\t(ADD, 500, 504, 1008)\n"
+            "3\t(ASSIGN, 1008, 500, )\n"
+            "4\t(PRINT, 1008, , )\n"
+        ))
+        self.assertEqual(stats, {'jump_threading': 2, 'unreachable': 3, 'jump_to_next': 1,
+                                 'identity': 2, 'self_assign': 1, 'fuse_assign': 2})
+
+    def test_optimizer_stats(self):
+        result = compile_program(self.valid_input, OPTIMIZE=True)
+        stats = result.get_parser().get_analyzer().get_optimizer_stats()
+        self.assertEqual(stats['fold_constants'], 5)
+        self.assertEqual(len(compile_program(self.valid_input).get_output().splitlines()) - 7,
+                         sum(stats.values()))
+
+    def test_allocate_temporaries(self):
+        program = parse_program(
+            "0\t(ADD, 500, #1, 1000)\n"
+            "1\t(MULT, 1000, #2, 1004)\n"
+            "2\t(LT, 1004, #9, 1008)\n"
+            "3\t(JPF, 1008, 8, )\n"
+            "4\t(ADD, 1000, 1004, 1012)\n"
+            "5\t(PRINT, 1012, , )\n"
+            "6\t(ASSIGN, 1004, 1000, )\n"
+            "7\t(JP, 1, , )\n"
+            "8\t(ASSIGN, #0, 1016, )\n"
+            "9\t(PRINT, 1016, , )\n"
+        )
+        stats = {}
+        allocated = allocate_temporaries(program, self.symbol_table(5), stats)
+        # 1000 is live around the loop but not between lines 4 and 6
+        self.assertEqual(format_program(allocated), (
+            "0\t(ADD, 500, #1, 1000)\n"
+            "1\t(MULT, 1000, #2, 1004)\n"
+            "2\t(LT, 1004, #9, 1008)\n"
+            "3\t(JPF, 1008, 8, )\n"
+            "4\t(ADD, 1000, 1004, 1000)\n"
+            "5\t(PRINT, 1000, , )\n"
+            "6\t(ASSIGN, 1004, 1000, )\n"
+            "7\t(JP, 1, , )\n"
+            "8\t(ASSIGN, #0, 1000, )\n"
+            "9\t(PRINT, 1000, , )\n"
+        ))
+        self.assertEqual(stats, {'temporaries_before': 5, 'temporaries_after': 3})
+        self.assertEqual(VirtualMachine(format_program(allocated)).run({500: 1}), [6, 12, 0])
+
+    def test_array_across_temporaries(self):
+        # a reaches past the temporary base, its cells are not temporaries
+        result = compile_program(
+            b"void main(void){\n"
+            b"int a[200];\n"
+            b"int i;\n"
+            b"i = 124;\n"
+            b"a[124] = 5;\n"
+            b"output(a[i]);\n"
+            b"output(a[124]);\n"
+            b"}\n", OPTIMIZE=True)
+        symbol_table = result.get_symbol_table()
+        self.assertFalse(symbol_table.is_temporary(1000))
+        self.assertTrue(symbol_table.is_temporary(symbol_table.get_temporaries()[0]))
+        self.assertEqual(VirtualMachine(result.get_output()).run(), [5, 5])
+
+    def test_renumber(self):
+        program = parse_program(
+            "0\t(JP, 3, , )\n"
+            "2\t(JPF, 500, 9, )\n"
+            "4\t(PRINT, 500, , )\n"
+            "5\t(JP, 2, , )\n"
+        )
+        self.assertEqual(format_program(renumber(program)), (
+            "0\t(JP, 2, , )\n"
+            "1\t(JPF, 500, 4, )\n"
+            "2\t(PRINT, 500, , )\n"
+            "3\t(JP, 1, , )\n"
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+from unittest import main, TestCase
+from context import OutputSink
+
+
+class TestOutputSink(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'output', 'tokens.txt')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.path, 'r') as output_file:
+            return output_file.read()
+
+    def test_write(self):
+        sink = OutputSink(self.path)
+        self.assertEqual(self.read(), '')
+        sink.write('1. (ID, a) \n')
+        sink.write('2. (ID, b) \n')
+        self.assertEqual(self.read(), '')
+        sink.close()
+        self.assertEqual(self.read(), '1. (ID, a) \n2. (ID, b) \n')
+
+    def test_flush_threshold(self):
+        sink = OutputSink(self.path, 4)
+        sink.write('abc')
+        self.assertEqual(self.read(), '')
+        sink.write('d')
+        self.assertEqual(self.read(), 'abcd')
+        sink.close()
+
+    def test_overwrite(self):
+        sink = OutputSink(self.path, 4)
+        sink.write('first line\n')
+        sink.overwrite('There is no syntax error.')
+        self.assertEqual(self.read(), 'first line\n')
+        sink.close()
+        self.assertEqual(self.read(), 'There is no syntax error.')
+        # Writes after close are appended
+        sink.write('\n')
+        sink.close()
+        self.assertEqual(self.read(), 'There is no syntax error.\n')
+
+
+if __name__ == '__main__':
+    main()
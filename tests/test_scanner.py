@@ -1,6 +1,21 @@
+import mmap
+import random
+import tempfile
 from unittest import main, TestCase, skip
 from unittest.mock import patch, mock_open
-from context import Scanner, TokenType, SymbolTable
+from context import Scanner, TokenType, MemoryOutput
+
+
+def scan_all(content, engine):
+    scanner = Scanner(content, OUTPUT=False, ENGINE=engine)
+    tokens = []
+    while True:
+        token = scanner()
+        tokens.append((token.get_type(), token.get_lexeme(),
+                       token.get_row(), token.get_column()))
+        if token.get_type() == TokenType.EOF:
+            return tokens, scanner.get_lexical_errors()
+
 
 class TestScanner(TestCase):
 
@@ -19,9 +34,6 @@ class TestScanner(TestCase):
             b"else */\n"
         )
 
-    def tearDown(self):
-      SymbolTable().clear()
-
     def test_token_type(self):
         scanner = Scanner(self.valid_input, OUTPUT=False)
 
@@ -108,6 +120,98 @@ class TestScanner(TestCase):
             current_token = scanner()
             self.assertEqual(current_token.get_lexeme(), expected_lexeme)
 
+    def test_lexical_errors(self):
+        _tokens, errors = scan_all(self.invalid_input, 'reference')
+        self.assertEqual([(row, lexeme) for row, lexeme, _error in errors], [
+                         (1, '3d'), (1, '3'), (3, 'cd!'), (3, 'c')])
+
+    def test_multiline_comment(self):
+        tokens, errors = scan_all(b"a /* b\nc */ d;\n", 'reference')
+        self.assertEqual([(lexeme, row) for _type, lexeme, row, _column in tokens], [
+                         ('a', 1), ('d', 2), (';', 2), ('$', 2)])
+        self.assertEqual(errors, [])
+
+    def test_engines(self):
+        for content in (self.valid_input, self.invalid_input, b"a /* b\nc */ d;\n"):
+            expected = scan_all(content, 'reference')
+            for engine in ('table', 'regex'):
+                self.assertEqual(scan_all(content, engine), expected, engine)
+
+    def test_engines_random_input(self):
+        pieces = [b' ', b'\n', b'\t', b'/', b'*', b'=', b'<', b';', b'a', b'1',
+                  b'!', b'if', b'int', b'\xb2', b'\xe9', b'/*', b'*/', b'//']
+        generator = random.Random(0)
+        for _ in range(500):
+            content = b''.join(generator.choice(pieces)
+                               for _ in range(generator.randint(0, 20)))
+            expected = scan_all(content, 'reference')
+            for engine in ('table', 'regex'):
+                self.assertEqual(scan_all(content, engine), expected, content)
+
+    def test_tokens(self):
+        for engine in ('reference', 'table', 'regex'):
+            expected, _errors = scan_all(self.invalid_input, engine)
+            scanner = Scanner(self.invalid_input, OUTPUT=False, ENGINE=engine)
+            tokens = [(token.get_type(), token.get_lexeme(), token.get_row(), token.get_column())
+                      for token in scanner.tokens()]
+            self.assertEqual(tokens, expected)
+            # Pulling past the end keeps returning EOF
+            self.assertEqual(scanner().get_type(), TokenType.EOF)
+
+    def test_token_blocks(self):
+        content = self.valid_input + b"x <= 10;\n"
+        for engine in ('reference', 'table', 'regex'):
+            expected, _errors = scan_all(content, engine)
+            scanner = Scanner(memoryview(content), OUTPUT=False, ENGINE=engine)
+            blocks = list(scanner.token_blocks(4))
+            self.assertEqual([len(block) for block in blocks], [4] * 5 + [1])
+            tokens = []
+            for block in blocks:
+                for index in range(len(block)):
+                    tokens.append((block.get_type(index), block.get_lexeme(index),
+                                   block.rows[index], block.columns[index]))
+            self.assertEqual(tokens, expected)
+            self.assertEqual([token.get_lexeme() for token in blocks[-1]], ['$'])
+
+    def test_token_blocks_random_input(self):
+        pieces = [b' ', b'\n', b'\t', b'/', b'*', b'=', b'<', b';', b'a', b'b1', b'1',
+                  b'!', b'if', b'int', b'\xb2', b'/*', b'*/', b'//']
+        generator = random.Random(1)
+        for _ in range(300):
+            content = b''.join(generator.choice(pieces)
+                               for _ in range(generator.randint(0, 20)))
+            for engine in ('reference', 'table', 'regex'):
+                expected = Scanner(content, OUTPUT=MemoryOutput(), ENGINE=engine)
+                tokens = [(token.get_type(), token.get_lexeme(), token.get_row(), token.get_column())
+                          for token in expected.tokens()]
+                for output in (False, MemoryOutput()):
+                    scanner = Scanner(content, OUTPUT=output, ENGINE=engine)
+                    blocks = list(scanner.token_blocks(3))
+                    self.assertEqual([(block.get_type(index), block.get_lexeme(index),
+                                       block.rows[index], block.columns[index])
+                                      for block in blocks for index in range(len(block))],
+                                     tokens, content)
+                    self.assertEqual(scanner.get_lexical_errors(), expected.get_lexical_errors())
+                    self.assertEqual(str(scanner.get_context().get_symbol_table()),
+                                     str(expected.get_context().get_symbol_table()))
+                    if output:
+                        self.assertEqual(output.get('tokens.txt'),
+                                         expected.get_context().get_output_backend().get('tokens.txt'))
+
+    def test_buffer_input(self):
+        content = self.valid_input + self.invalid_input
+        with tempfile.TemporaryFile() as content_file:
+            content_file.write(content)
+            content_file.flush()
+            mapped = mmap.mmap(content_file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+            for engine in ('reference', 'table', 'regex'):
+                expected = scan_all(content, engine)
+                self.assertEqual(
+                    scan_all(memoryview(content), engine), expected)
+                self.assertEqual(scan_all(mapped, engine), expected)
+            mapped.close()
+
     @skip("TODO")
     @patch("builtins.open", new_callable=mock_open, read_data="data")
     def test_write_lexical_error(self, mocked_function):
@@ -118,5 +222,28 @@ class TestScanner(TestCase):
     def test_write_tokens_file(self, mocked_function):
       pass
 
+class TestScannerStress(TestCase):
+    """Inputs far deeper than the recursion limit, for every engine."""
+
+    whitespace_input = b"a" + b" " * 10 ** 6 + b"b;\n"
+    invalid_input = b"a " + b"@ " * 10 ** 5 + b"b;\n"
+
+    def test_whitespace(self):
+        for engine in ('reference', 'table', 'regex'):
+            tokens, errors = scan_all(self.whitespace_input, engine)
+            self.assertEqual([lexeme for _type, lexeme, _row, _column in tokens], [
+                             'a', 'b', ';', '$'])
+            self.assertEqual(tokens[1][3], 10 ** 6 + 1)
+            self.assertEqual(errors, [])
+
+    def test_invalid_input(self):
+        expected = scan_all(self.invalid_input, 'reference')
+        self.assertEqual([lexeme for _type, lexeme, _row, _column in expected[0]], [
+                         'a', 'b', ';', '$'])
+        self.assertEqual(len(expected[1]), 10 ** 5)
+        for engine in ('table', 'regex'):
+            self.assertEqual(scan_all(self.invalid_input, engine), expected)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,6 @@
-from unittest import main, TestCase, skip
+from unittest import main, TestCase, skip, expectedFailure
 from unittest.mock import patch, mock_open
-from context import Parser, Scanner, SymbolTable, SemanticAnalyzer, ActionSymbol
+from context import Parser, Scanner, SemanticAnalyzer, ActionSymbol, compile_program, VirtualMachine
 
 
 class TestSemanticAnalyzer(TestCase):
@@ -92,24 +92,24 @@ class TestSemanticAnalyzer(TestCase):
         b"}\n"
     )
 
-    # TODO: CONTAINS ERROR AFTER LINE 3
+    # arr takes 504 to 543, chained assignments only store the last value,
+    # see test_chained_assignment
     expected_output_3 = (
         "0	(ASSIGN, #0, 500, )\n"
-        "1	(ASSIGN, #0, 508, )\n"
-        "2	(ASSIGN, #0, 512, )\n"
-        "3	(ASSIGN, #1, 508, )\n"
-        "4	(ASSIGN, #5, 512, )\n"
-        "5	(PRINT, 508, , )\n"
-        "6	(PRINT, #0, , )\n"
-        "7	(ASSIGN, #7, 512, )\n"
-        "8	(PRINT, 508, , )\n"
-        "9	(PRINT, 512, , )\n"
-        "10	(PRINT, #5, , )\n"
+        "1	(ASSIGN, #0, 544, )\n"
+        "2	(ASSIGN, #0, 548, )\n"
+        "3	(ASSIGN, #1, 544, )\n"
+        "4	(ASSIGN, #5, 548, )\n"
+        "5	(PRINT, 544, , )\n"
+        "6	(PRINT, 504, , )\n"
+        "7	(MULT, 544, #4, 1000)\n"
+        "8	(ADD, 1000, #504, 1004)\n"
+        "9	(ASSIGN, #7, 548, )\n"
+        "10	(PRINT, 544, , )\n"
+        "11	(PRINT, 548, , )\n"
+        "12	(PRINT, 524, , )\n"
     )
 
-    def tearDown(self):
-        SymbolTable().clear()
-
     def test_code_generation(self):
         self.maxDiff = None
         scanner = Scanner(self.valid_input)
@@ -134,6 +134,12 @@ class TestSemanticAnalyzer(TestCase):
             output = output_file.read()
         self.assertEqual(output, self.expected_output_3)
 
+    @expectedFailure
+    def test_chained_assignment(self):
+        # Only the innermost ASSIGN of a = b = c is generated
+        result = compile_program(self.valid_input_3)
+        self.assertEqual(VirtualMachine(result.get_output()).run(), [5, 5, 5, 7, 7])
+
     @skip("TODO")
     def test_semantic(self):
         pass
@@ -166,16 +172,29 @@ class TestSemanticAnalyzer(TestCase):
         analyzer = SemanticAnalyzer()
         analyzer._line_count = 101
         analyzer._write_address_code(
-            increment=False, line=110, operation='op', arguments=['item1'])
+            increment=False, line=110, operation='JP', arguments=[120])
         self.assertEqual(analyzer.get_line_count(), 101)
-        mocked_function.assert_called_with('./output/output.txt', 'w')
-        mocked_function.return_value.__enter__().writelines.assert_called_with([
-            '110\t(op, item1, , )\n'])
-        analyzer._write_address_code(operation='test', arguments=[
-                                     'item1', 'item2', 'item3'])
+        mocked_function.assert_any_call('./output/output.txt', 'w')
+        analyzer._write_address_code(operation='ADD', arguments=[
+                                     '#1', 504, 1000])
         self.assertEqual(analyzer.get_line_count(), 102)
-        mocked_function.return_value.__enter__().writelines.assert_called_with(
-            ['101\t(test, item1, item2, item3)\n', '110\t(op, item1, , )\n'])
+        # The program block is buffered and written once
+        mocked_function.return_value.write.assert_not_called()
+        analyzer.close_output()
+        mocked_function.return_value.write.assert_called_once_with(
+            '101\t(ADD, #1, 504, 1000)\n110\t(JP, 120, , )\n')
+
+    def test_backpatch(self):
+        analyzer = SemanticAnalyzer(OUTPUT=False)
+        analyzer._action_save('test')
+        analyzer._semantic_stack.push(500)
+        analyzer._output_routine('test')
+        self.assertEqual(analyzer.get_code(), '1\t(PRINT, 500, , )\n')
+        analyzer.set_semantic_stack([1000, 0])
+        analyzer._action_conditional_jump('test')
+        self.assertEqual(analyzer.get_code(),
+                         '0\t(JPF, 1000, 2, )\n1\t(PRINT, 500, , )\n')
+        self.assertEqual(analyzer.get_semantic_stack(), [])
 
     @patch('compiler.semantic_analyzer.SemanticAnalyzer._write_address_code')
     def test_action_assign(self, mocked_function):
@@ -311,6 +330,44 @@ class TestSemanticAnalyzer(TestCase):
             arguments=['item1'], operation='PRINT')
         self.assertTrue(analyzer._semantic_stack.is_empty())
 
+    @patch('compiler.semantic_analyzer.SemanticAnalyzer._write_address_code')
+    def test_action_access_array(self, mocked_function):
+        analyzer = SemanticAnalyzer(OUTPUT=False)
+        analyzer.set_semantic_stack([504, '#3'])
+        analyzer._action_access_array('test')
+        self.assertEqual(analyzer.get_semantic_stack(), [516])
+        mocked_function.assert_not_called()
+        analyzer.set_semantic_stack([504, 508])
+        analyzer._action_access_array('test')
+        mocked_function.assert_any_call(
+            arguments=[508, '#4', 1000], operation='MULT')
+        mocked_function.assert_called_with(
+            arguments=[1000, '#504', 1004], operation='ADD')
+        self.assertEqual(analyzer.get_semantic_stack(), ['@1004'])
+
+    def test_arrays(self):
+        result = compile_program(
+            b"void main(void){\n"
+            b"int a[300];\n"
+            b"int i;\n"
+            b"i = 0;\n"
+            b"while (i < 300) {\n"
+            b"a[i] = i * 2;\n"
+            b"i = i + 1;\n"
+            b"}\n"
+            b"a[124] = 5;\n"
+            b"i = 124;\n"
+            b"output(a[i]);\n"
+            b"output(a[125]);\n"
+            b"output(a[299]);\n"
+            b"}\n")
+        symbol_table = result.get_symbol_table()
+        # a[124] is at 1000, where the temporaries used to start
+        self.assertEqual(symbol_table.lookup('a').get_address(), 504)
+        self.assertEqual(symbol_table.lookup('i').get_address(), 504 + 300 * 4)
+        self.assertEqual(symbol_table.lookup_with_address(1000).name, 'a')
+        self.assertEqual(VirtualMachine(result.get_output()).run(), [5, 250, 598])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,53 @@
+from unittest import main, TestCase
+from context import SymbolTable, Symbol
+
+
+class TestSymbolTable(TestCase):
+
+    def test_lookup_with_address(self):
+        symbol_table = SymbolTable()
+        for name in ('main', 'a', 'arr', 'b'):
+            symbol_table.insert(Symbol(name))
+            if name == 'arr':
+                symbol_table.allocate_array(symbol_table.lookup(name), 10)
+        arr = symbol_table.lookup('arr')
+        self.assertEqual(symbol_table.lookup_with_address(504).name, 'a')
+        self.assertEqual(symbol_table.lookup_with_address(508), arr)
+        # Any element resolves to its array
+        self.assertEqual(symbol_table.lookup_with_address(520), arr)
+        self.assertEqual(symbol_table.lookup_with_address(544), arr)
+        self.assertEqual(symbol_table.lookup_with_address(548).name, 'b')
+        self.assertIsNone(symbol_table.lookup_with_address(552))
+        self.assertIsNone(symbol_table.lookup_with_address(496))
+
+    def test_set_address(self):
+        symbol_table = SymbolTable()
+        symbol_table.insert(Symbol('a'))
+        symbol_table.insert(Symbol('b'))
+        # a is not the last symbol, so the array moves behind b
+        symbol_table.allocate_array(symbol_table.lookup('a'), 3)
+        self.assertEqual(symbol_table.lookup('a').get_address(), 508)
+        self.assertIsNone(symbol_table.lookup_with_address(500))
+        self.assertEqual(symbol_table.lookup_with_address(516).name, 'a')
+        symbol_table.set_address(symbol_table.lookup('a'), 600)
+        self.assertIsNone(symbol_table.lookup_with_address(516))
+        self.assertEqual(symbol_table.lookup_with_address(608).name, 'a')
+        symbol_table.clear()
+        self.assertIsNone(symbol_table.lookup_with_address(600))
+
+    def test_temporaries_after_data(self):
+        symbol_table = SymbolTable()
+        symbol_table.insert(Symbol('a'))
+        symbol_table.allocate_array(symbol_table.lookup('a'), 200)
+        # The array reaches past 1000, so the temporaries start after it
+        self.assertEqual(symbol_table.get_temporary_address(), 1300)
+        symbol_table.insert(Symbol('b'))
+        self.assertEqual(symbol_table.lookup('b').get_address(), 1304)
+        symbol_table.insert(Symbol('c'))
+        symbol_table.allocate_array(symbol_table.lookup('c'), 2)
+        self.assertEqual(symbol_table.lookup('c').get_address(), 1308)
+        self.assertEqual(symbol_table.get_temporary_address(), 1316)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+from unittest import main, TestCase, skipIf
+from context import compile_program, VirtualMachine, VMError
+from context import VectorVirtualMachine, numpy, HALTED, LIMIT_EXCEEDED, FAILED
+
+
+@skipIf(numpy is None, "numpy is not installed")
+class TestVectorVirtualMachine(TestCase):
+
+    # Squares 504 into 512 and counts 508 up to it
+    count_program = (
+        "0\t(MULT, 504, 504, 512)\n"
+        "1\t(ASSIGN, #0, 508, )\n"
+        "2\t(LT, 508, 504, 1000)\n"
+        "3\t(JPF, 1000, 7, )\n"
+        "4\t(ADD, #1, 508, 1004)\n"
+        "5\t(ASSIGN, 1004, 508, )\n"
+        "6\t(JP, 2, , )\n"
+        "7\t(PRINT, 508, , )\n"
+        "8\t(EQ, 508, #3, 1008)\n"
+        "9\t(JPF, 1008, 11, )\n"
+        "10\t(PRINT, #-1, , )\n"
+        "11\t(PRINT, 512, , )\n"
+    )
+
+    def test_matches_vm(self):
+        values = [0, 3, 7, -2, 3, 1]
+        vm = VectorVirtualMachine(self.count_program)
+        outputs = vm.run({504: values})
+        for index, value in enumerate(values):
+            expected = VirtualMachine(self.count_program)
+            self.assertEqual(outputs[index], expected.run({504: value}))
+            self.assertEqual(vm.get_instruction_counts()[index],
+                             expected.get_instruction_count())
+        self.assertEqual(list(vm.get_memory_values(508)), [0, 3, 7, 0, 3, 1])
+        self.assertTrue((vm.get_statuses() == HALTED).all())
+        self.assertEqual(vm.run([{504: 2}, {}]), [[2, 4], [0, 0]])
+
+    def test_compiled_program(self):
+        program = compile_program(
+            b"void main(void){\nint a;\na = 0;\nwhile (a < 6){\na = a + 2;\noutput(a);\n}\n}\n").get_output()
+        outputs = VectorVirtualMachine(program).run(3)
+        self.assertEqual(outputs, [VirtualMachine(program).run()] * 3)
+
+    def test_stopped_instances(self):
+        vm = VectorVirtualMachine(self.count_program, MAX_INSTRUCTIONS=50)
+        outputs = vm.run({504: [2, 100, 30, 3]})
+        self.assertEqual(list(vm.get_statuses()),
+                         [HALTED, LIMIT_EXCEEDED, LIMIT_EXCEEDED, HALTED])
+        self.assertEqual(outputs[3], [3, -1, 9])
+        vm = VectorVirtualMachine(self.count_program)
+        outputs = vm.run({504: [65536, 2]})
+        self.assertEqual(list(vm.get_statuses()), [FAILED, HALTED])
+        self.assertEqual(outputs, [[], [2, 4]])
+        self.assertEqual(vm.get_instruction_counts()[0], 0)
+        self.assertIn(0, vm.get_errors())
+
+    def test_indirect(self):
+        program = (
+            "0\t(ASSIGN, #7, @500, )\n"
+            "1\t(PRINT, @500, , )\n"
+        )
+        vm = VectorVirtualMachine(program, MEMORY_SIZE=256)
+        self.assertEqual(vm.run({500: [504, 508, 3]}), [[7], [7], []])
+        self.assertEqual(list(vm.get_statuses()), [HALTED, HALTED, FAILED])
+        self.assertEqual(list(vm.get_memory_values(508)), [0, 7, 0])
+        with self.assertRaises(VMError):
+            vm.run({500: [2 ** 40]})
+
+    def test_initial_addresses(self):
+        vm = VectorVirtualMachine("0\t(ADD, 500, #3, 504)\n1\t(PRINT, 504, , )\n")
+        # 508 would be the cell of #3 in the constant pool
+        for initial in ({508: [100, 1]}, [{}, {508: 100}], {10 ** 6: [1]}, {502: [1]}):
+            with self.assertRaises(VMError):
+                vm.run(initial)
+        self.assertEqual(vm.run({500: [1, 2]}), [[4], [5]])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+from unittest import main, TestCase
+from context import compile_program, VirtualMachine, VMError, ExecutionLimitExceeded, MODES
+
+
+class TestVirtualMachine(TestCase):
+
+    loop_input = (
+        b"void main(void){\n"
+        b"int a;\n"
+        b"int b;\n"
+        b"a = 0;\n"
+        b"b = 1;\n"
+        b"while (a < 10){\n"
+        b"a = a + 1;\n"
+        b"b = b * 2;\n"
+        b"if (a == 5){\n"
+        b"output(b);\n"
+        b"}\n"
+        b"else{\n"
+        b"b = b - 0;\n"
+        b"}\n"
+        b"}\n"
+        b"output(a);\n"
+        b"output(b);\n"
+        b"}\n"
+    )
+
+    def test_run(self):
+        program = compile_program(self.loop_input).get_output()
+        for mode in MODES:
+            vm = VirtualMachine(program, MODE=mode)
+            self.assertEqual(vm.run(), [32, 10, 1024])
+            self.assertEqual(vm.get_memory_value(504), 10)
+            self.assertEqual(vm.get_instruction_count(), 119)
+            # Every run starts from fresh memory
+            self.assertEqual(vm.run(), [32, 10, 1024])
+
+    def test_initial_memory(self):
+        for mode in MODES:
+            vm = VirtualMachine(
+                "0\t(ADD, 500, #3, 504)\n1\t(PRINT, 504, , )\n", MODE=mode)
+            self.assertEqual(vm.run(), [3])
+            self.assertEqual(vm.run({500: 4}), [7])
+            # 508 is not a cell of the program, the constant pool follows 504
+            for initial in ({508: 100}, {10 ** 6: 1}, {502: 1}, {500: 2 ** 31}):
+                with self.assertRaises(VMError):
+                    vm.run(initial)
+            vm = VirtualMachine(
+                "0\t(ADD, 500, #3, 504)\n1\t(PRINT, 504, , )\n", MODE=mode, MEMORY_SIZE=128)
+            self.assertEqual(vm.run({508: 100}), [3])
+
+    def test_operations(self):
+        program = (
+            "0\t(SUB, #3, #5, 500)\n"
+            "1\t(LT, 500, #0, 504)\n"
+            "2\t(EQ, 500, #-2, 508)\n"
+            "3\t(ASSIGN, #508, 512, )\n"
+            "4\t(ADD, @512, #1, 516)\n"
+            "5\t(ASSIGN, #7, @512, )\n"
+            "7\t(PRINT, 500, , )\n"
+            "8\t(PRINT, 504, , )\n"
+            "9\t(PRINT, 516, , )\n"
+            "10\t(PRINT, 508, , )\n"
+        )
+        for mode in MODES:
+            self.assertEqual(VirtualMachine(
+                program, MODE=mode).run(), [-2, 1, 2, 7])
+
+    def test_limits(self):
+        program = "0\t(ADD, 500, #1, 500)\n1\t(JP, 0, , )\n"
+        for mode in MODES:
+            vm = VirtualMachine(program, MODE=mode, MAX_INSTRUCTIONS=1000)
+            with self.assertRaises(ExecutionLimitExceeded):
+                vm.run()
+            # Memory holds the state at the stop, blocks are not split
+            self.assertEqual(vm.get_memory_value(500), 501 if mode == 'interpreter' else 500)
+            vm = VirtualMachine(program, MODE=mode,
+                                MAX_INSTRUCTIONS=None, TIME_LIMIT=0.05)
+            with self.assertRaises(ExecutionLimitExceeded):
+                vm.run()
+            vm = VirtualMachine("0\t(JPF, 500, 7, )\n",
+                                MODE=mode, MAX_INSTRUCTIONS=1)
+            self.assertEqual(vm.run(), [])
+            self.assertEqual(vm.get_instruction_count(), 1)
+
+    def test_python_source(self):
+        program = compile_program(self.loop_input).get_output()
+        first = VirtualMachine(program, MODE='python')
+        second = VirtualMachine(program, MODE='python')
+        self.assertEqual(first.get_python_source(), second.get_python_source())
+        self.assertEqual(first.run(), second.run())
+        # Both machines execute the same cached code object
+        self.assertIs(first._python_function.__code__,
+                      second._python_function.__code__)
+
+    def test_errors(self):
+        with self.assertRaises(VMError):
+            VirtualMachine("0\t(ASSIGN, #1, 501, )\n")
+        with self.assertRaises(VMError):
+            VirtualMachine("0\t(CALL, 500, , )\n")
+        with self.assertRaises(VMError):
+            VirtualMachine("0\t(ADD, 500, , )\n", MODE='jit')
+        with self.assertRaises(VMError):
+            VirtualMachine("0\t(ASSIGN, #4294967296, 500, )\n")
+        for mode in MODES:
+            with self.assertRaises(VMError):
+                VirtualMachine("0\t(MULT, #65536, #65536, 500)\n",
+                               MODE=mode).run()
+            vm = VirtualMachine("0\t(ADD, 500, 500, 500)\n1\t(JP, 0, , )\n", MODE=mode)
+            with self.assertRaisesRegex(VMError, "line 0"):
+                vm.run({500: 1})
+            self.assertEqual(vm.get_memory_value(500), 2 ** 30)
+
+
+if __name__ == '__main__':
+    main()